@@ -15,7 +15,10 @@ from .types import (
     CDPResponse, AccessibilityNode, ElementRole, ElementState,
     IndexedElement, PageState
 )
-from .config import DOMAnalyzerConfig, CDPConfig, AccessibilityConfig, IndexingConfig
+from .config import (
+    DOMAnalyzerConfig, CDPConfig, AccessibilityConfig, IndexingConfig, ServerConfig,
+    default_config
+)
 
 __version__ = "0.1.0"
 __author__ = "Browser Assistant Team"
@@ -44,5 +47,7 @@ __all__ = [
     "DOMAnalyzerConfig",
     "CDPConfig",
     "AccessibilityConfig",
-    "IndexingConfig"
+    "IndexingConfig",
+    "ServerConfig",
+    "default_config"
 ]
@@ -7,14 +7,36 @@ Accessibility Parser
 
 import logging
 import re
-from typing import Dict, List, Any, Optional, Set
+import sys
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass
 
-from .types import AccessibilityNode, ElementRole, ElementState
+from .types import (
+    AccessibilityNode, ElementRole, ElementState, mask_to_states, states_to_mask
+)
 from .config import AccessibilityConfig
 
 
-@dataclass
+# Целочисленные коды известных AX ролей (для проверки ролей битовой маской)
+_ROLE_CODES: Dict[str, int] = {
+    role: code for code, role in enumerate([
+        *(member.value for member in ElementRole),
+        'RootWebArea', 'StaticText', 'InlineTextBox', 'LineBreak', 'none',
+        'heading', 'paragraph', 'image', 'list', 'listitem', 'group',
+        'region', 'navigation', 'main', 'banner', 'contentinfo', 'form',
+        'search', 'article', 'separator', 'table', 'cell',
+        'option', 'switch', 'slider', 'spinbutton', 'menubar', 'tablist',
+        'tree', 'treeitem'
+    ])
+}
+
+# Код для ролей, отсутствующих в _ROLE_CODES
+_UNKNOWN_ROLE_CODE = 63
+
+
+@dataclass(frozen=True, slots=True)
 class AXProperty:
     """Свойство Accessibility узла"""
     name: str
@@ -22,7 +44,24 @@ class AXProperty:
     source: str = "accessibility"
 
 
-@dataclass
+# Пул общих экземпляров AXProperty с булевыми значениями
+_PROP_POOL: Dict[Tuple[str, Optional[bool], str], AXProperty] = {}
+
+
+def _mk_prop(name: str, value: Any, source: str = "accessibility") -> AXProperty:
+    """Создание AXProperty; булевы свойства переиспользуются из пула"""
+    # Строки и числа не кэшируем: их словарь неограничен, а 1 == True для dict
+    if value.__class__ is not bool and value is not None:
+        return AXProperty(name, value, source)
+    
+    key = (name, value, source)
+    prop = _PROP_POOL.get(key)
+    if prop is None:
+        prop = _PROP_POOL[key] = AXProperty(name, value, source)
+    return prop
+
+
+@dataclass(slots=True)
 class ParsedAXNode:
     """Распарсенный Accessibility узел"""
     node_id: int
@@ -37,11 +76,40 @@ class ParsedAXNode:
     backend_dom_node_id: Optional[int]
     ignored: bool = False
     is_interactive: bool = False
+    role_code: int = _UNKNOWN_ROLE_CODE
 
 
 class AccessibilityParser:
     """Парсер Accessibility Tree"""
     
+    # Состояния, указывающие на интерактивность
+    _INTERACTIVE_STATES = frozenset({'button', 'link', 'menuitem', 'tab'})
+    
+    # Свойства, указывающие на интерактивность
+    _INTERACTIVE_PROPS = frozenset({'clickable', 'pressable', 'selectable'})
+    
+    # Свойства-обработчики событий
+    _EVENT_PROPS = frozenset({'onclick', 'onkeydown', 'onkeyup', 'onsubmit'})
+    
+    # Регулярные выражения для очистки текста
+    _RE_WS = re.compile(r'\s+')
+    _RE_STRIP = re.compile(r'<[^>]+>|[\x00-\x1f\x7f-\x9f]')
+    
+    # Соответствие имен состояний значениям ElementState
+    _STATE_MAPPING = {
+        'visible': ElementState.VISIBLE,
+        'hidden': ElementState.HIDDEN,
+        'disabled': ElementState.DISABLED,
+        'readonly': ElementState.READONLY,
+        'required': ElementState.REQUIRED,
+        'invalid': ElementState.INVALID,
+        'expanded': ElementState.EXPANDED,
+        'collapsed': ElementState.COLLAPSED,
+        'selected': ElementState.SELECTED,
+        'checked': ElementState.CHECKED,
+        'focused': ElementState.FOCUSED
+    }
+    
     def __init__(self, config: Optional[AccessibilityConfig] = None):
         self.config = config or AccessibilityConfig()
         self.logger = logging.getLogger("AccessibilityParser")
@@ -49,12 +117,18 @@ class AccessibilityParser:
         # Роли, которые считаются интерактивными
         self.interactive_roles = self.config.interactive_roles
         
+        # Битовая маска интерактивных ролей по их кодам
+        self._interactive_mask = 0
+        for role in self.interactive_roles:
+            if role in _ROLE_CODES:
+                self._interactive_mask |= 1 << _ROLE_CODES[role]
+        
         # Состояния, которые важны для автоматизации
-        self.important_states = {
+        self.important_states = frozenset({
             'expanded', 'collapsed', 'selected', 'checked', 'pressed',
             'disabled', 'readonly', 'required', 'invalid', 'focused',
             'hidden', 'visible', 'busy', 'live'
-        }
+        })
     
     def parse_accessibility_tree(self, ax_tree_data: Dict[str, Any]) -> List[AccessibilityNode]:
         """Парсинг Accessibility Tree из CDP ответа"""
@@ -63,23 +137,12 @@ class AccessibilityParser:
                 self.logger.warning("Invalid accessibility tree data")
                 return []
             
-            nodes_data = ax_tree_data['nodes']
-            parsed_nodes = []
+            nodes_data = self._limit_tree(ax_tree_data['nodes'])
+            accessibility_nodes = []
             
-            # Первый проход: парсим все узлы
+            # Один проход: парсинг, определение интерактивности и конвертация
             for node_data in nodes_data:
-                parsed_node = self._parse_single_node(node_data)
-                if parsed_node:
-                    parsed_nodes.append(parsed_node)
-            
-            # Второй проход: определяем интерактивность
-            for node in parsed_nodes:
-                node.is_interactive = self._is_node_interactive(node)
-            
-            # Конвертируем в наши типы
-            accessibility_nodes = []
-            for parsed_node in parsed_nodes:
-                ax_node = self._convert_to_accessibility_node(parsed_node)
+                ax_node = self._parse_node_data(node_data)
                 if ax_node:
                     accessibility_nodes.append(ax_node)
             
@@ -90,18 +153,74 @@ class AccessibilityParser:
             self.logger.error(f"Error parsing accessibility tree: {e}")
             return []
     
+    def _limit_tree(self, nodes_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ограничение дерева по глубине и количеству узлов (обход в ширину от корней)"""
+        max_nodes = self.config.max_nodes
+        max_depth = self.config.max_depth
+        if not max_nodes and not max_depth:
+            return nodes_data
+        
+        nodes_by_id = {node_data.get('nodeId'): node_data for node_data in nodes_data}
+        queue = deque(
+            (node_data, 0) for node_data in nodes_data
+            if node_data.get('parentId') not in nodes_by_id
+        )
+        
+        kept = set()
+        reached_depth = 0
+        while queue:
+            if max_nodes and len(kept) >= max_nodes:
+                break
+            
+            node_data, depth = queue.popleft()
+            if id(node_data) in kept:
+                continue
+            
+            if max_depth and depth > max_depth:
+                continue
+            
+            kept.add(id(node_data))
+            reached_depth = max(reached_depth, depth)
+            for child_id in node_data.get('childIds', []):
+                child = nodes_by_id.get(child_id)
+                if child is not None:
+                    queue.append((child, depth + 1))
+        
+        if len(kept) == len(nodes_data):
+            return nodes_data
+        
+        self.logger.warning(f"Truncated AX parse at depth={reached_depth} "
+                            f"nodes={len(kept)} (total {len(nodes_data)})")
+        
+        # Сохраняем исходный порядок узлов документа
+        return [node_data for node_data in nodes_data if id(node_data) in kept]
+    
+    def _parse_node_data(self, node_data: Dict[str, Any]) -> Optional[AccessibilityNode]:
+        """Парсинг, определение интерактивности и конвертация одного узла"""
+        # Игнорируемые узлы не используются дальше - не тратим на них парсинг
+        if self.config.skip_ignored_nodes and node_data.get('ignored'):
+            return None
+        
+        parsed_node = self._parse_single_node(node_data)
+        if parsed_node is None:
+            return None
+        
+        parsed_node.is_interactive = self._is_node_interactive(parsed_node)
+        
+        return self._convert_to_accessibility_node(parsed_node)
+    
     def _parse_single_node(self, node_data: Dict[str, Any]) -> Optional[ParsedAXNode]:
         """Парсинг отдельного AX узла"""
         try:
             # Извлекаем основные поля
             node_id = node_data.get('nodeId', 0)
-            role_data = node_data.get('role', {})
-            name_data = node_data.get('name', {})
-            value_data = node_data.get('value', {})
-            description_data = node_data.get('description', {})
+            role_data = node_data.get('role')
+            name_data = node_data.get('name')
+            value_data = node_data.get('value')
+            description_data = node_data.get('description')
             
-            # Роль узла
-            role = role_data.get('value', 'generic') if role_data else 'generic'
+            # Роль узла (интернируем: на странице всего несколько десятков разных ролей)
+            role = sys.intern(role_data.get('value', 'generic')) if role_data else 'generic'
             
             # Имя узла
             name = name_data.get('value', '') if name_data else ''
@@ -112,23 +231,11 @@ class AccessibilityParser:
             # Описание узла
             description = description_data.get('value') if description_data else None
             
-            # Свойства узла
-            properties = self._parse_node_properties(node_data)
-            
-            # Состояния узла
-            states = self._extract_node_states(node_data)
-            
-            # Дочерние узлы
-            children = node_data.get('childIds', [])
-            
-            # Родительский узел
-            parent_id = node_data.get('parentId')
+            # Свойства узла и состояния из них
+            properties, states = self._walk_properties(node_data)
             
-            # ID DOM узла
-            backend_dom_node_id = node_data.get('backendDOMNodeId')
-            
-            # Игнорируется ли узел
-            ignored = node_data.get('ignored', False)
+            # Состояния из основных полей узла
+            self._extract_node_states(node_data, states)
             
             # Проверяем валидность текста
             if not self.is_text_valid(name):
@@ -142,69 +249,63 @@ class AccessibilityParser:
                 description=description,
                 properties=properties,
                 states=states,
-                children=children,
-                parent_id=parent_id,
-                backend_dom_node_id=backend_dom_node_id,
-                ignored=ignored,
-                is_interactive=False  # Будет установлено позже
+                children=node_data.get('childIds', []),
+                parent_id=node_data.get('parentId'),
+                backend_dom_node_id=node_data.get('backendDOMNodeId'),
+                ignored=node_data.get('ignored', False),
+                role_code=_ROLE_CODES.get(role, _UNKNOWN_ROLE_CODE),
+                is_interactive=False  # Устанавливается при парсинге дерева
             )
             
         except Exception as e:
             self.logger.error(f"Error parsing single node: {e}")
             return None
     
-    def _parse_node_properties(self, node_data: Dict[str, Any]) -> List[AXProperty]:
-        """Парсинг свойств узла"""
+    def _walk_properties(self, node_data: Dict[str, Any]) -> Tuple[List[AXProperty], List[str]]:
+        """Парсинг свойств узла и состояний из них за один проход"""
         properties = []
+        states = []
         
         try:
             # Получаем свойства из разных источников
             ax_properties = node_data.get('properties', [])
+            important_states = self.important_states
             
             for prop_data in ax_properties:
-                prop_name = prop_data.get('name', {}).get('value', '')
-                prop_value = prop_data.get('value', {}).get('value')
+                # Корректные CDP данные содержат оба ключа, исключение - только для битых узлов
+                try:
+                    prop_name = sys.intern(prop_data['name']['value'])
+                    prop_value = prop_data['value'].get('value')
+                except (KeyError, TypeError, AttributeError):
+                    continue
                 
                 if prop_name and prop_value is not None:
-                    property_obj = AXProperty(
-                        name=prop_name,
-                        value=prop_value,
-                        source="accessibility"
-                    )
-                    properties.append(property_obj)
+                    properties.append(_mk_prop(prop_name, prop_value, "accessibility"))
+                
+                if prop_name in important_states and prop_value:
+                    states.append(prop_name)
             
             # Добавляем дополнительные свойства из других полей
             if 'checked' in node_data:
-                properties.append(AXProperty('checked', node_data['checked'], 'node'))
+                properties.append(_mk_prop('checked', node_data['checked'], 'node'))
             
             if 'expanded' in node_data:
-                properties.append(AXProperty('expanded', node_data['expanded'], 'node'))
+                properties.append(_mk_prop('expanded', node_data['expanded'], 'node'))
             
             if 'selected' in node_data:
-                properties.append(AXProperty('selected', node_data['selected'], 'node'))
+                properties.append(_mk_prop('selected', node_data['selected'], 'node'))
             
             if 'disabled' in node_data:
-                properties.append(AXProperty('disabled', node_data['disabled'], 'node'))
+                properties.append(_mk_prop('disabled', node_data['disabled'], 'node'))
             
         except Exception as e:
             self.logger.error(f"Error parsing node properties: {e}")
         
-        return properties
+        return properties, states
     
-    def _extract_node_states(self, node_data: Dict[str, Any]) -> List[str]:
-        """Извлечение состояний узла"""
-        states = []
-        
+    def _extract_node_states(self, node_data: Dict[str, Any], states: List[str]) -> List[str]:
+        """Дополнение состояний узла из его основных полей"""
         try:
-            # Получаем состояния из properties
-            ax_properties = node_data.get('properties', [])
-            for prop_data in ax_properties:
-                prop_name = prop_data.get('name', {}).get('value', '')
-                prop_value = prop_data.get('value', {}).get('value')
-                
-                if prop_name in self.important_states and prop_value:
-                    states.append(prop_name)
-            
             # Добавляем состояния из основных полей
             if node_data.get('checked'):
                 states.append('checked')
@@ -242,24 +343,27 @@ class AccessibilityParser:
     
     def _is_node_interactive(self, node: ParsedAXNode) -> bool:
         """Определение, является ли узел интерактивным"""
-        # Проверяем роль
-        if node.role in self.interactive_roles:
+        # Проверяем роль (известные роли - по битовой маске)
+        if node.role_code != _UNKNOWN_ROLE_CODE:
+            if (1 << node.role_code) & self._interactive_mask:
+                return True
+        elif node.role in self.interactive_roles:
             return True
         
         # Проверяем состояния
-        interactive_states = {'button', 'link', 'menuitem', 'tab'}
-        if any(state in interactive_states for state in node.states):
-            return True
-        
-        # Проверяем свойства
-        interactive_properties = {'clickable', 'pressable', 'selectable'}
-        if any(prop.name in interactive_properties and prop.value for prop in node.properties):
+        if not self._INTERACTIVE_STATES.isdisjoint(node.states):
             return True
         
-        # Проверяем наличие обработчиков событий
-        event_properties = {'onclick', 'onkeydown', 'onkeyup', 'onsubmit'}
-        if any(prop.name in event_properties for prop in node.properties):
-            return True
+        interactive_properties = self._INTERACTIVE_PROPS
+        event_properties = self._EVENT_PROPS
+        for prop in node.properties:
+            # Проверяем свойства
+            if prop.value and prop.name in interactive_properties:
+                return True
+            
+            # Проверяем наличие обработчиков событий
+            if prop.name in event_properties:
+                return True
         
         return False
     
@@ -268,7 +372,8 @@ class AccessibilityParser:
         interactive_nodes = []
         
         for node in nodes:
-            if self._is_node_interactive_from_accessibility_node(node):
+            # Флаг вычисляется при парсинге; проверка по роли - для узлов, созданных вне парсера
+            if node.is_interactive or self._is_node_interactive_from_accessibility_node(node):
                 interactive_nodes.append(node)
         
         self.logger.info(f"Found {len(interactive_nodes)} interactive elements out of {len(nodes)} total")
@@ -277,15 +382,7 @@ class AccessibilityParser:
     def _is_node_interactive_from_accessibility_node(self, node: AccessibilityNode) -> bool:
         """Определение интерактивности для AccessibilityNode"""
         # Проверяем роль
-        if node.role in self.interactive_roles:
-            return True
-        
-        # Проверяем состояния
-        interactive_states = {'button', 'link', 'menuitem', 'tab'}
-        if any(state in interactive_states for state in node.state.values()):
-            return True
-        
-        return False
+        return node.role in self.interactive_roles
     
     def extract_element_states(self, node: AccessibilityNode) -> List[ElementState]:
         """Извлечение состояний элемента"""
@@ -293,22 +390,10 @@ class AccessibilityParser:
         
         try:
             # Конвертируем состояния из AccessibilityNode в ElementState
-            state_mapping = {
-                'visible': ElementState.VISIBLE,
-                'hidden': ElementState.HIDDEN,
-                'disabled': ElementState.DISABLED,
-                'readonly': ElementState.READONLY,
-                'required': ElementState.REQUIRED,
-                'invalid': ElementState.INVALID,
-                'expanded': ElementState.EXPANDED,
-                'collapsed': ElementState.COLLAPSED,
-                'selected': ElementState.SELECTED,
-                'checked': ElementState.CHECKED,
-                'focused': ElementState.FOCUSED
-            }
-            
-            for state_name, state_value in node.state.items():
-                if state_name in state_mapping and state_value:
+            state_mapping = self._STATE_MAPPING
+            
+            for state_name in mask_to_states(node.state):
+                if state_name in state_mapping:
                     states.append(state_mapping[state_name])
             
         except Exception as e:
@@ -332,43 +417,41 @@ class AccessibilityParser:
         if not text:
             return ""
         
+        return self._clean_text_cached(text)
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _clean_text_cached(text: str) -> str:
+        """Очистка текста с кэшированием повторяющихся строк"""
         # Базовая очистка
         cleaned = text.strip()
         
         # Убираем множественные пробелы
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = AccessibilityParser._RE_WS.sub(' ', cleaned)
         
-        # Убираем невидимые символы
-        cleaned = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', cleaned)
-        
-        # Убираем HTML теги (если есть)
-        cleaned = re.sub(r'<[^>]+>', '', cleaned)
+        # Убираем HTML теги (если есть) и невидимые символы
+        cleaned = AccessibilityParser._RE_STRIP.sub('', cleaned)
         
         return cleaned
     
     def _convert_to_accessibility_node(self, parsed_node: ParsedAXNode) -> Optional[AccessibilityNode]:
         """Конвертация ParsedAXNode в AccessibilityNode"""
         try:
-            # Конвертируем состояния в словарь
-            state_dict = {}
-            for state in parsed_node.states:
-                state_dict[state] = True
-            
-            # Конвертируем свойства в словарь
-            properties_dict = {}
-            for prop in parsed_node.properties:
-                properties_dict[prop.name] = prop.value
-            
+            # CDP передает ID строками - приводим типы здесь, один раз на узел
+            value = parsed_node.value
+            parent_id = parsed_node.parent_id
+            backend_dom_node_id = parsed_node.backend_dom_node_id
             return AccessibilityNode(
-                node_id=parsed_node.node_id,
+                node_id=int(parsed_node.node_id),
                 role=parsed_node.role,
                 name=parsed_node.name,
-                value=parsed_node.value,
+                value=value if value is None or isinstance(value, str) else str(value),
                 description=parsed_node.description,
-                state=state_dict,
-                children=parsed_node.children,
-                parent_id=parsed_node.parent_id,
-                backend_dom_node_id=parsed_node.backend_dom_node_id
+                state=states_to_mask(parsed_node.states),
+                children=[int(child_id) for child_id in parsed_node.children],
+                parent_id=int(parent_id) if parent_id is not None else None,
+                backend_dom_node_id=int(backend_dom_node_id) if backend_dom_node_id is not None else None,
+                is_interactive=parsed_node.is_interactive
             )
             
         except Exception as e:
@@ -389,8 +472,7 @@ class AccessibilityParser:
             parts.append(f"value='{self.clean_text(str(node.value))}'")
         
         if node.state:
-            # Фильтруем только True состояния
-            true_states = [k for k, v in node.state.items() if v is True]
+            true_states = mask_to_states(node.state)
             if true_states:
                 parts.append(f"states=[{', '.join(true_states)}]")
         
@@ -8,13 +8,29 @@ CDP Client
 import asyncio
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import os
+import time
+from functools import partial
+from typing import Dict, Any, Callable, Optional, List, Sequence, Tuple
 from urllib.parse import urlparse
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
 from .types import CDPResponse, PageState
 from .config import CDPConfig
 
 
+# Команды, из которых собирается снимок страницы: (ключ результата, метод CDP)
+_PAGE_TREE_COMMANDS = (
+    ("dom_tree", "DOM.getDocument"),
+    ("accessibility_tree", "Accessibility.getFullAXTree"),
+    ("page_metrics", "Page.getLayoutMetrics"),
+)
+
+
 class CDPSession:
     """CDP сессия для конкретной вкладки"""
     
@@ -23,6 +39,172 @@ class CDPSession:
         self.session_id = session_id
         self.cdp_client = cdp_client
         self.logger = logging.getLogger(f"CDPSession-{target_id}")
+        
+        # Событие загрузки страницы, выставляется по Page.loadEventFired
+        self.load_event = asyncio.Event()
+    
+    def handle_event(self, method: str, params: Optional[Dict[str, Any]] = None):
+        """Обработка CDP события для этой сессии"""
+        if method == 'Page.loadEventFired':
+            self.load_event.set()
+        elif method == 'Page.frameStartedLoading':
+            self.load_event.clear()
+
+
+class _PipeProtocol(asyncio.Protocol):
+    """Чтение сообщений CDP из пайпа (JSON, разделенные нулевым байтом)"""
+    
+    def __init__(self, owner: "CDPPipeTransport"):
+        self._owner = owner
+        self._buffer = bytearray()
+    
+    def data_received(self, data: bytes):
+        buffer = self._buffer
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\0", start)
+            if end < 0:
+                break
+            self._owner._on_message(bytes(buffer[start:end]))
+            start = end + 1
+        if start:
+            del buffer[:start]
+    
+    def connection_lost(self, exc: Optional[Exception]):
+        self._owner._on_closed(exc)
+
+
+class CDPPipeTransport:
+    """CDP поверх --remote-debugging-pipe: команды и ответы идут через пару пайпов, без WebSocket и TCP"""
+    
+    def __init__(self, read_fd: int, write_fd: int,
+                 on_event: Callable[[Optional[str], str, Optional[Dict[str, Any]]], None],
+                 timeout: Optional[float] = None):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.timeout = timeout
+        self.logger = logging.getLogger("CDPPipeTransport")
+        self._on_event = on_event
+        
+        # Ожидающие ответа команды: id -> Future
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._reader: Optional[asyncio.ReadTransport] = None
+        self._writer: Optional[asyncio.WriteTransport] = None
+        
+        # Команды, отправленные за одну итерацию цикла, уходят одной записью в пайп
+        self._outgoing: List[bytes] = []
+        self._flush_scheduled = False
+    
+    async def open(self):
+        """Подключение к дескрипторам пайпа"""
+        loop = asyncio.get_running_loop()
+        self._reader, _ = await loop.connect_read_pipe(
+            lambda: _PipeProtocol(self), os.fdopen(self.read_fd, "rb", buffering=0)
+        )
+        self._writer, _ = await loop.connect_write_pipe(
+            asyncio.Protocol, os.fdopen(self.write_fd, "wb", buffering=0)
+        )
+    
+    async def send(self, method: str, params: Optional[Dict[str, Any]] = None,
+                   session_id: Optional[str] = None) -> Any:
+        """Отправка команды и ожидание ее результата"""
+        if self._writer is None:
+            raise ConnectionError("CDP pipe is closed")
+        
+        self._next_id += 1
+        message_id = self._next_id
+        message: Dict[str, Any] = {"id": message_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        if session_id:
+            message["sessionId"] = session_id
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[message_id] = future
+        outgoing = self._outgoing
+        outgoing.append(orjson.dumps(message) if orjson is not None else json.dumps(message).encode())
+        outgoing.append(b"\0")
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(message_id, None)
+    
+    def _flush(self):
+        """Запись накопленных команд одним системным вызовом"""
+        self._flush_scheduled = False
+        outgoing = self._outgoing
+        if not outgoing:
+            return
+        self._outgoing = []
+        if self._writer is not None:
+            self._writer.write(b"".join(outgoing))
+    
+    def close(self):
+        """Закрытие пайпов"""
+        for transport in (self._reader, self._writer):
+            if transport is not None:
+                transport.close()
+        self._on_closed(None)
+    
+    def _on_message(self, payload: bytes):
+        """Ответ на команду или событие"""
+        try:
+            message = CDPClient._decode_payload(payload)
+        except Exception as e:
+            self.logger.error(f"Invalid CDP message: {e}")
+            return
+        
+        message_id = message.get("id")
+        if message_id is None:
+            self._on_event(message.get("sessionId"), message.get("method", ""), message.get("params"))
+            return
+        
+        future = self._pending.get(message_id)
+        if future is None or future.done():
+            return
+        error = message.get("error")
+        if error:
+            future.set_exception(Exception(error.get("message", str(error))))
+        else:
+            future.set_result(message.get("result", {}))
+    
+    def _on_closed(self, exc: Optional[Exception]):
+        """Пайп закрыт - ожидающие команды завершаются ошибкой"""
+        self._reader = None
+        self._writer = None
+        self._outgoing = []
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"CDP pipe closed: {exc}" if exc else "CDP pipe closed"))
+
+
+class _PipeCommands:
+    """Команды CDP через пайп в виде send.Domain.method(params, session_id=...)"""
+    __slots__ = ('_transport', '_domain')
+    
+    def __init__(self, transport: CDPPipeTransport, domain: str = ""):
+        self._transport = transport
+        self._domain = domain
+    
+    def __getattr__(self, name: str):
+        if self._domain:
+            return partial(self._transport.send, f"{self._domain}.{name}")
+        return _PipeCommands(self._transport, name)
+
+
+class _PipeCDPClient:
+    """cdp_client сессии, работающий через пайп"""
+    __slots__ = ('send',)
+    
+    def __init__(self, transport: CDPPipeTransport):
+        self.send = _PipeCommands(transport)
 
 
 class CDPClient:
@@ -34,9 +216,21 @@ class CDPClient:
         self.port = None
         self.debugger_url = None
         self.targets = []
-        self.sessions = {}
         self.logger = logging.getLogger("CDPClient")
         
+        # Кэш CDP сессий по target_id и блокировки для их создания
+        self._cached_cdp_sessions: Dict[str, CDPSession] = {}
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        
+        # HTTP клиент для /json эндпоинта (создается при первом запросе)
+        self._http = None
+        
+        # Время последнего получения списка вкладок (time.monotonic)
+        self._targets_fetched_at = 0.0
+        
+        # Транспорт --remote-debugging-pipe (если заданы дескрипторы в конфигурации)
+        self._pipe: Optional[CDPPipeTransport] = None
+        
         # Настройка логирования
         logging.basicConfig(level=logging.INFO)
     
@@ -46,6 +240,14 @@ class CDPClient:
             self.port = port
             self.debugger_url = f"http://localhost:{port}/json"
             
+            # Chrome запущен с --remote-debugging-pipe - работаем через пайпы вместо порта
+            if self._pipe is None and self.config.pipe_read_fd >= 0 and self.config.pipe_write_fd >= 0:
+                self._pipe = CDPPipeTransport(
+                    self.config.pipe_read_fd, self.config.pipe_write_fd,
+                    self.dispatch_event, self.config.command_timeout / 1000
+                )
+                await self._pipe.open()
+            
             # Получаем список доступных вкладок
             await self._get_targets()
             
@@ -56,7 +258,8 @@ class CDPClient:
                 )
             
             self.connected = True
-            self.logger.info(f"Connected to Chrome on port {port}, found {len(self.targets)} targets")
+            transport = "pipe" if self._pipe is not None else f"port {port}"
+            self.logger.info(f"Connected to Chrome on {transport}, found {len(self.targets)} targets")
             
             return CDPResponse(
                 success=True,
@@ -78,10 +281,22 @@ class CDPClient:
         """Отключение от CDP"""
         try:
             # Закрываем все сессии
-            for session in self.sessions.values():
+            for session in self._cached_cdp_sessions.values():
                 await self._close_session(session)
             
-            self.sessions.clear()
+            self._cached_cdp_sessions.clear()
+            self._session_locks.clear()
+            
+            # Закрываем HTTP клиент
+            if self._http is not None:
+                await self._http.aclose()
+                self._http = None
+            
+            # Закрываем пайп
+            if self._pipe is not None:
+                self._pipe.close()
+                self._pipe = None
+            
             self.targets.clear()
             self.connected = False
             
@@ -107,7 +322,9 @@ class CDPClient:
             )
         
         try:
-            await self._get_targets()
+            # Свежий список (например, полученный при подключении) переиспользуем
+            if time.monotonic() - self._targets_fetched_at > self.config.targets_cache_ttl / 1000:
+                await self._get_targets()
             return CDPResponse(
                 success=True,
                 data={"targets": self.targets}
@@ -118,20 +335,35 @@ class CDPClient:
                 error=f"Failed to get targets: {str(e)}"
             )
     
+    def _session_cached_sync(self, target_id: str) -> Optional[CDPSession]:
+        """Синхронный поиск сессии в кэше (без проверки живости)"""
+        return self._cached_cdp_sessions.get(target_id)
+    
     async def get_or_create_session(self, target_id: str, focus: bool = False) -> CDPSession:
         """Получение или создание CDP сессии для вкладки"""
-        if target_id in self.sessions:
-            return self.sessions[target_id]
+        lock = self._session_locks.get(target_id)
+        if lock is None:
+            lock = self._session_locks.setdefault(target_id, asyncio.Lock())
         
-        try:
-            # Создаем новую сессию
-            session = await self._create_session(target_id, focus)
-            self.sessions[target_id] = session
-            return session
+        async with lock:
+            # Переиспользуем живую сессию из кэша
+            session = self._cached_cdp_sessions.get(target_id)
+            if session is not None:
+                if await self._is_session_alive(session):
+                    return session
+                self.logger.info(f"Cached session for target {target_id} is stale, recreating")
+                self._cached_cdp_sessions.pop(target_id, None)
+                await self._close_session(session)
             
-        except Exception as e:
-            self.logger.error(f"Failed to create session for target {target_id}: {e}")
-            raise
+            try:
+                # Создаем новую сессию
+                session = await self._create_session(target_id, focus)
+                self._cached_cdp_sessions[target_id] = session
+                return session
+                
+            except Exception as e:
+                self.logger.error(f"Failed to create session for target {target_id}: {e}")
+                raise
     
     async def get_dom_tree(self, target_id: str) -> CDPResponse:
         """Получение DOM дерева для конкретной вкладки"""
@@ -142,7 +374,7 @@ class CDPClient:
             )
         
         try:
-            session = await self.get_or_create_session(target_id, focus=False)
+            session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
             
             # Получаем DOM дерево через заглушку
             dom_result = await session.cdp_client.send.DOM.getDocument(
@@ -155,6 +387,7 @@ class CDPClient:
             )
             
         except Exception as e:
+            self._invalidate_cache_for_target(target_id)
             return CDPResponse(
                 success=False,
                 error=f"Failed to get DOM tree: {str(e)}"
@@ -169,7 +402,7 @@ class CDPClient:
             )
         
         try:
-            session = await self.get_or_create_session(target_id, focus=False)
+            session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
             
             # Получаем Accessibility Tree через заглушку
             ax_result = await session.cdp_client.send.Accessibility.getFullAXTree(
@@ -182,6 +415,7 @@ class CDPClient:
             )
             
         except Exception as e:
+            self._invalidate_cache_for_target(target_id)
             return CDPResponse(
                 success=False,
                 error=f"Failed to get Accessibility Tree: {str(e)}"
@@ -196,7 +430,7 @@ class CDPClient:
             )
         
         try:
-            session = await self.get_or_create_session(target_id, focus=False)
+            session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
             
             # Получаем метрики страницы через заглушку
             metrics = await session.cdp_client.send.Page.getLayoutMetrics(
@@ -209,11 +443,116 @@ class CDPClient:
             )
             
         except Exception as e:
+            self._invalidate_cache_for_target(target_id)
             return CDPResponse(
                 success=False,
                 error=f"Failed to get page metrics: {str(e)}"
             )
     
+    async def get_all_trees(self, target_id: str) -> CDPResponse:
+        """Параллельное получение DOM, Accessibility Tree и метрик страницы"""
+        if not self.connected:
+            return CDPResponse(
+                success=False,
+                error="Not connected to CDP"
+            )
+        
+        try:
+            results = await self.batch(target_id, [(method, None) for _, method in _PAGE_TREE_COMMANDS])
+            return self._collect_tree_results(target_id, results)
+            
+        except Exception as e:
+            self._invalidate_cache_for_target(target_id)
+            return CDPResponse(
+                success=False,
+                error=f"Failed to get page trees: {str(e)}"
+            )
+    
+    async def batch_page_analysis(self, target_id: str) -> Tuple[CDPResponse, CDPResponse]:
+        """Информация о вкладке и деревья страницы одним пакетом команд"""
+        if not self.connected:
+            error = CDPResponse(
+                success=False,
+                error="Not connected to CDP"
+            )
+            return error, error
+        
+        try:
+            commands = [("Target.getTargetInfo", {"targetId": target_id})]
+            commands.extend((method, None) for _, method in _PAGE_TREE_COMMANDS)
+            results = await self.batch(target_id, commands)
+            
+        except Exception as e:
+            self._invalidate_cache_for_target(target_id)
+            error = CDPResponse(
+                success=False,
+                error=f"Failed to get page trees: {str(e)}"
+            )
+            return error, error
+        
+        info_result = results[0]
+        if isinstance(info_result, BaseException):
+            info_response = CDPResponse(
+                success=False,
+                error=f"Failed to get target info: {str(info_result)}"
+            )
+        else:
+            info_response = CDPResponse(
+                success=True,
+                data=info_result.get("targetInfo", {})
+            )
+        
+        return info_response, self._collect_tree_results(target_id, results[1:])
+    
+    async def batch(self, target_id: str,
+                    commands: Sequence[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Any]:
+        """Отправка пакета CDP команд в сессию вкладки.
+        
+        Все команды уходят в сокет подряд, до ожидания первого ответа.
+        Возвращает результаты в порядке команд; ошибка команды возвращается
+        как исключение на ее месте.
+        """
+        session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
+        send = session.cdp_client.send
+        
+        calls = []
+        for method, params in commands:
+            domain, name = method.split(".", 1)
+            command = getattr(getattr(send, domain), name)
+            if params is None:
+                calls.append(command(session_id=session.session_id))
+            else:
+                calls.append(command(params, session_id=session.session_id))
+        
+        return await asyncio.gather(*calls, return_exceptions=True)
+    
+    def _collect_tree_results(self, target_id: str, results: Sequence[Any]) -> CDPResponse:
+        """Сборка ответа get_all_trees с раздельными ошибками подзапросов"""
+        data: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for (key, _), result in zip(_PAGE_TREE_COMMANDS, results):
+            if isinstance(result, BaseException):
+                data[key] = None
+                errors[key] = str(result)
+            else:
+                data[key] = result
+        
+        if errors:
+            self._invalidate_cache_for_target(target_id)
+            data["errors"] = errors
+        
+        if len(errors) == len(results):
+            return CDPResponse(
+                success=False,
+                data=data,
+                error=f"Failed to get page trees: {errors}"
+            )
+        
+        return CDPResponse(
+            success=True,
+            data=data
+        )
+    
     async def execute_script(self, target_id: str, script: str) -> CDPResponse:
         """Выполнение JavaScript кода в конкретной вкладке"""
         if not self.connected:
@@ -223,7 +562,7 @@ class CDPClient:
             )
         
         try:
-            session = await self.get_or_create_session(target_id, focus=False)
+            session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
             
             # Выполняем JavaScript через заглушку
             result = await session.cdp_client.send.Runtime.evaluate(
@@ -237,6 +576,7 @@ class CDPClient:
             )
             
         except Exception as e:
+            self._invalidate_cache_for_target(target_id)
             return CDPResponse(
                 success=False,
                 error=f"Failed to execute script: {str(e)}"
@@ -251,27 +591,31 @@ class CDPClient:
             )
         
         try:
-            session = await self.get_or_create_session(target_id, focus=False)
-            
-            # Ждем готовности страницы
-            start_time = asyncio.get_event_loop().time()
-            while (asyncio.get_event_loop().time() - start_time) * 1000 < timeout:
-                try:
-                    result = await session.cdp_client.send.Runtime.evaluate(
-                        params={'expression': 'document.readyState'},
-                        session_id=session.session_id
-                    )
-                    
-                    if result.get('result', {}).get('value') == 'complete':
-                        return CDPResponse(
-                            success=True,
-                            data={"status": "page_loaded"}
-                        )
-                    
-                    await asyncio.sleep(0.1)
-                    
-                except Exception:
-                    await asyncio.sleep(0.1)
+            session = self._session_cached_sync(target_id) or await self.get_or_create_session(target_id, focus=False)
+            
+            # Страница могла загрузиться до подписки на события
+            if await self._is_document_ready(session):
+                return CDPResponse(
+                    success=True,
+                    data={"status": "page_loaded"}
+                )
+            
+            # Ждем события Page.loadEventFired
+            try:
+                await asyncio.wait_for(session.load_event.wait(), timeout=timeout / 1000)
+                return CDPResponse(
+                    success=True,
+                    data={"status": "page_loaded"}
+                )
+            except asyncio.TimeoutError:
+                pass
+            
+            # Финальная проверка на случай пропущенного события
+            if await self._is_document_ready(session):
+                return CDPResponse(
+                    success=True,
+                    data={"status": "page_loaded"}
+                )
             
             return CDPResponse(
                 success=False,
@@ -284,6 +628,13 @@ class CDPClient:
                 error=f"Failed to wait for page load: {str(e)}"
             )
     
+    def dispatch_event(self, session_id: str, method: str, params: Optional[Dict[str, Any]] = None):
+        """Передача CDP события соответствующей сессии"""
+        for session in self._cached_cdp_sessions.values():
+            if session.session_id == session_id:
+                session.handle_event(method, params)
+                return
+    
     def is_connected(self) -> bool:
         """Проверка подключения"""
         return self.connected
@@ -297,24 +648,104 @@ class CDPClient:
     
     async def _get_targets(self):
         """Получение списка вкладок из Chrome"""
-        import httpx
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(self.debugger_url)
+        if self._pipe is not None:
+            # Через пайп - Target.getTargets в формате /json
+            result = await self._pipe.send("Target.getTargets")
+            self.targets = [
+                {
+                    "id": info.get("targetId"),
+                    "type": info.get("type", ""),
+                    "title": info.get("title", ""),
+                    "url": info.get("url", "")
+                }
+                for info in result.get("targetInfos", [])
+            ]
+        else:
+            if self._http is None:
+                import httpx
+                
+                self._http = httpx.AsyncClient(
+                    timeout=self.config.connection_timeout / 1000,
+                    limits=httpx.Limits(max_keepalive_connections=4)
+                )
+            
+            response = await self._http.get(self.debugger_url)
             response.raise_for_status()
-            self.targets = response.json()
+            self.targets = self._decode_payload(response.content)
+        self._targets_fetched_at = time.monotonic()
+        
+        # Сбрасываем сессии закрытых вкладок
+        alive_ids = {target.get('id') for target in self.targets}
+        for target_id in list(self._cached_cdp_sessions):
+            if target_id not in alive_ids:
+                self._invalidate_cache_for_target(target_id)
+    
+    @staticmethod
+    def _decode_payload(payload: bytes) -> Any:
+        """Декодирование JSON ответа CDP (orjson, если установлен)"""
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
+    
+    async def _is_session_alive(self, session: CDPSession) -> bool:
+        """Проверка, что закэшированная сессия еще отвечает"""
+        try:
+            await asyncio.wait_for(
+                session.cdp_client.send.Runtime.evaluate(
+                    params={'expression': '1'},
+                    session_id=session.session_id
+                ),
+                timeout=self.config.session_probe_timeout / 1000
+            )
+            return True
+        except Exception:
+            return False
+    
+    async def _is_document_ready(self, session: CDPSession) -> bool:
+        """Проверка document.readyState == 'complete'"""
+        try:
+            result = await session.cdp_client.send.Runtime.evaluate(
+                params={'expression': 'document.readyState'},
+                session_id=session.session_id
+            )
+            return result.get('result', {}).get('value') == 'complete'
+        except Exception:
+            return False
+    
+    def _invalidate_cache_for_target(self, target_id: str):
+        """Удаление сессии вкладки из кэша"""
+        if self._cached_cdp_sessions.pop(target_id, None) is not None:
+            self.logger.debug(f"Invalidated cached session for target {target_id}")
     
     async def _create_session(self, target_id: str, focus: bool) -> CDPSession:
         """Создание CDP сессии для вкладки"""
+        if self._pipe is not None:
+            return await self._create_pipe_session(target_id, focus)
+        
         # TODO: Реализовать создание реальной CDP сессии
         # Пока возвращаем заглушку для тестирования
         
         # Имитируем создание сессии
         session_id = f"session_{target_id}_{int(asyncio.get_event_loop().time())}"
         
+        client = self
+        
         # Создаем заглушку cdp_client
         class MockCDPClient:
             class send:
+                class Target:
+                    @staticmethod
+                    async def getTargetInfo(params: Dict, session_id: str):
+                        for target in client.targets:
+                            if target.get("id") == params.get("targetId"):
+                                return {"targetInfo": {
+                                    "targetId": target.get("id"),
+                                    "type": target.get("type", ""),
+                                    "title": target.get("title", ""),
+                                    "url": target.get("url", "")
+                                }}
+                        raise Exception(f"Target {params.get('targetId')} not found")
+                
                 class DOM:
                     @staticmethod
                     async def getDocument(session_id: str):
@@ -326,6 +757,10 @@ class CDPClient:
                         return {"nodes": []}
                 
                 class Page:
+                    @staticmethod
+                    async def enable(session_id: str):
+                        return {}
+                    
                     @staticmethod
                     async def getLayoutMetrics(session_id: str):
                         return {"visualViewport": {"width": 1920, "height": 1080}}
@@ -337,9 +772,33 @@ class CDPClient:
         
         cdp_client = MockCDPClient()
         
+        # Подписываемся на события страницы (Page.loadEventFired)
+        await cdp_client.send.Page.enable(session_id=session_id)
+        
+        return CDPSession(target_id, session_id, cdp_client)
+    
+    async def _create_pipe_session(self, target_id: str, focus: bool) -> CDPSession:
+        """Создание CDP сессии через пайп (flatten-режим: sessionId в каждом сообщении)"""
+        pipe = self._pipe
+        if focus:
+            await pipe.send("Target.activateTarget", {"targetId": target_id})
+        
+        attached = await pipe.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+        session_id = attached["sessionId"]
+        cdp_client = _PipeCDPClient(pipe)
+        
+        # Подписываемся на события страницы (Page.loadEventFired)
+        await cdp_client.send.Page.enable(session_id=session_id)
+        
         return CDPSession(target_id, session_id, cdp_client)
     
     async def _close_session(self, session: CDPSession):
         """Закрытие CDP сессии"""
+        if self._pipe is not None:
+            try:
+                await self._pipe.send("Target.detachFromTarget", {"sessionId": session.session_id})
+            except Exception as e:
+                self.logger.debug(f"Error detaching session {session.session_id}: {e}")
+            return
+        
         # TODO: Реализовать закрытие реальной CDP сессии
-        pass
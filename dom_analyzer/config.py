@@ -5,59 +5,99 @@
 """
 
 import os
-from typing import Dict, Any
+from functools import cache, lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
 from dataclasses import dataclass, field
 
 
-@dataclass
+# Роли интерактивных элементов по умолчанию (общий неизменяемый набор)
+_DEFAULT_INTERACTIVE_ROLES = frozenset({
+    'button', 'link', 'textbox', 'checkbox', 'radio',
+    'combobox', 'listbox', 'menu', 'menuitem', 'tab',
+    'dialog', 'alert', 'toolbar', 'grid', 'gridcell'
+})
+
+
+@dataclass(slots=True)
 class CDPConfig:
     """Конфигурация CDP клиента"""
     # Таймауты
     connection_timeout: int = 10000  # мс
     command_timeout: int = 30000     # мс
+    session_probe_timeout: int = 1000  # мс, проверка живости закэшированной сессии
+    targets_cache_ttl: int = 1000  # мс, сколько переиспользовать список вкладок
     
     # Параметры подключения
     default_port: int = 9222
     localhost_only: bool = True
     
+    # Транспорт --remote-debugging-pipe: унаследованные дескрипторы
+    # (чтение ответов Chrome, запись команд); -1 - подключение через порт
+    pipe_read_fd: int = -1
+    pipe_write_fd: int = -1
+    
     # Лимиты
     max_nodes_per_request: int = 1000
     max_depth: int = 10
 
 
-@dataclass
+@dataclass(slots=True)
 class AccessibilityConfig:
     """Конфигурация Accessibility Tree"""
     # Фильтрация элементов
     min_text_length: int = 1
     max_text_length: int = 500
     
+    # Пропускать узлы с ignored=True (Chrome помечает так служебные узлы,
+    # которые не попадают в дерево доступности). Их дети остаются в дереве.
+    skip_ignored_nodes: bool = True
+    
+    # Ограничения разбора дерева (0 - без ограничения)
+    max_nodes: int = 20000
+    max_depth: int = 40
+    
     # Роли для интерактивных элементов
-    interactive_roles: set = field(default_factory=lambda: {
-        'button', 'link', 'textbox', 'checkbox', 'radio',
-        'combobox', 'listbox', 'menu', 'menuitem', 'tab',
-        'dialog', 'alert', 'toolbar', 'grid', 'gridcell'
-    })
+    interactive_roles: frozenset = _DEFAULT_INTERACTIVE_ROLES
 
 
-@dataclass
+@dataclass(slots=True)
 class IndexingConfig:
     """Конфигурация индексации элементов"""
     # Стратегия индексации
     use_stable_indices: bool = True
     cache_duration: int = 30  # секунды
     
+    # Хеш DOM в контексте индексации (нужен только для get_indexing_stats)
+    enable_dom_hash: bool = False
+    
     # Лимиты
     max_elements: int = 1000
     max_interactive: int = 200
 
 
-@dataclass
+@dataclass(slots=True)
+class ServerConfig:
+    """Настройки MCP сервера"""
+    # Параллельная обработка запросов
+    max_concurrent_requests: int = 8
+    
+    # Принятые, но еще не обработанные запросы (дальше чтение stdin приостанавливается)
+    max_inflight_requests: int = 64
+    
+    # Лимит размера снимка страницы в browser_get_state (символы)
+    max_snapshot_chars: int = 50000
+    
+    # Результаты инструментов с отступами (только для отладки)
+    debug_pretty: bool = False
+
+
+@dataclass(slots=True)
 class DOMAnalyzerConfig:
     """Основная конфигурация DOM Analyzer"""
     cdp: CDPConfig = field(default_factory=CDPConfig)
     accessibility: AccessibilityConfig = field(default_factory=AccessibilityConfig)
     indexing: IndexingConfig = field(default_factory=IndexingConfig)
+    server: ServerConfig = field(default_factory=ServerConfig)
     
     # Общие настройки
     debug: bool = False
@@ -68,43 +108,70 @@ class DOMAnalyzerConfig:
     cache_size: int = 100
 
 
-def load_config_from_env() -> DOMAnalyzerConfig:
-    """Загрузка конфигурации из переменных окружения"""
-    config = DOMAnalyzerConfig()
-    
+def _parse_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+# Переменные окружения: (ключ, раздел конфигурации или None, поле, конвертер)
+_ENV_KEYS: Tuple[Tuple[str, Optional[str], str, Callable[[str], Any]], ...] = (
     # CDP настройки
-    if os.getenv("CDP_CONNECTION_TIMEOUT"):
-        config.cdp.connection_timeout = int(os.getenv("CDP_CONNECTION_TIMEOUT"))
-    
-    if os.getenv("CDP_COMMAND_TIMEOUT"):
-        config.cdp.command_timeout = int(os.getenv("CDP_COMMAND_TIMEOUT"))
-    
-    if os.getenv("CDP_PORT"):
-        config.cdp.default_port = int(os.getenv("CDP_PORT"))
+    ("CDP_CONNECTION_TIMEOUT", "cdp", "connection_timeout", int),
+    ("CDP_COMMAND_TIMEOUT", "cdp", "command_timeout", int),
+    ("CDP_PORT", "cdp", "default_port", int),
+    ("CDP_TARGETS_CACHE_TTL", "cdp", "targets_cache_ttl", int),
+    ("CDP_PIPE_READ_FD", "cdp", "pipe_read_fd", int),
+    ("CDP_PIPE_WRITE_FD", "cdp", "pipe_write_fd", int),
     
     # Accessibility настройки
-    if os.getenv("MIN_TEXT_LENGTH"):
-        config.accessibility.min_text_length = int(os.getenv("MIN_TEXT_LENGTH"))
-    
-    if os.getenv("MAX_TEXT_LENGTH"):
-        config.accessibility.max_text_length = int(os.getenv("MAX_TEXT_LENGTH"))
+    ("MIN_TEXT_LENGTH", "accessibility", "min_text_length", int),
+    ("MAX_TEXT_LENGTH", "accessibility", "max_text_length", int),
     
     # Индексация
-    if os.getenv("ENABLE_CACHING"):
-        config.enable_caching = os.getenv("ENABLE_CACHING").lower() == "true"
+    ("ENABLE_CACHING", None, "enable_caching", _parse_bool),
+    ("CACHE_DURATION", "indexing", "cache_duration", int),
+    ("ENABLE_DOM_HASH", "indexing", "enable_dom_hash", _parse_bool),
     
-    if os.getenv("CACHE_DURATION"):
-        config.indexing.cache_duration = int(os.getenv("CACHE_DURATION"))
+    # MCP сервер
+    ("MCP_MAX_CONCURRENT_REQUESTS", "server", "max_concurrent_requests", int),
+    ("MCP_MAX_INFLIGHT_REQUESTS", "server", "max_inflight_requests", int),
+    ("MCP_MAX_SNAPSHOT_CHARS", "server", "max_snapshot_chars", int),
+    ("MCP_DEBUG_PRETTY", "server", "debug_pretty", _parse_bool),
     
     # Отладка
-    if os.getenv("DEBUG"):
-        config.debug = os.getenv("DEBUG").lower() == "true"
+    ("DEBUG", None, "debug", _parse_bool),
+    ("LOG_LEVEL", None, "log_level", str),
+)
+
+
+@lru_cache(maxsize=1)
+def _read_env_overrides() -> Tuple[Tuple[Optional[str], str, Any], ...]:
+    """Однократное чтение и разбор переменных окружения"""
+    overrides = []
+    for key, section, name, convert in _ENV_KEYS:
+        value = os.environ.get(key)
+        if value:
+            overrides.append((section, name, convert(value)))
+    return tuple(overrides)
+
+
+def load_config_from_env(reset_cache: bool = False) -> DOMAnalyzerConfig:
+    """Загрузка конфигурации из переменных окружения"""
+    if reset_cache:
+        _read_env_overrides.cache_clear()
     
-    if os.getenv("LOG_LEVEL"):
-        config.log_level = os.getenv("LOG_LEVEL")
+    # Каждый вызов получает собственный экземпляр, окружение читается один раз
+    config = DOMAnalyzerConfig()
+    for section, name, value in _read_env_overrides():
+        target = getattr(config, section) if section else config
+        setattr(target, name, value)
     
     return config
 
 
-# Глобальная конфигурация по умолчанию
-DEFAULT_CONFIG = DOMAnalyzerConfig()
+# Глобальная конфигурация по умолчанию (вместо DEFAULT_CONFIG).
+# Экземпляр общий для всех компонентов без явной конфигурации - не изменяйте его
+# на месте, для своих настроек создайте DOMAnalyzerConfig() или load_config_from_env().
+@cache
+def default_config() -> DOMAnalyzerConfig:
+    """Конфигурация по умолчанию, создается при первом обращении"""
+    return DOMAnalyzerConfig()
@@ -6,22 +6,68 @@ DOM Analyzer
 """
 
 import asyncio
+import hashlib
 import logging
+import struct
 import time
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from functools import cached_property, wraps
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from dataclasses import dataclass, field
 
 from .cdp_client import CDPClient, CDPSession
 from .accessibility_parser import AccessibilityParser
 from .element_indexer import ElementIndexer
 from .types import (
     AccessibilityNode, IndexedElement, ElementRole, ElementState,
-    PageState, CDPResponse
+    PageState, CDPResponse, ROLE_VALUES
 )
-from .config import DOMAnalyzerConfig
+from .config import DOMAnalyzerConfig, default_config
 
 
-@dataclass
+# Поля, участвующие в хеше DOM (извлекаются одним C-вызовом на узел)
+_NODE_HASH_FIELDS = attrgetter('node_id', 'role', 'name', 'value')
+_ELEMENT_HASH_FIELDS = attrgetter('index', 'role', 'text')
+
+# Заголовки записей хеша: (node_id, len(role), len(name), len(value) или -1 для None)
+# и (index, len(role), len(text))
+_pack_node_header = struct.Struct('<qiii').pack
+_pack_element_header = struct.Struct('<qii').pack
+
+
+def _tree_fingerprint(accessibility_tree: Any) -> str:
+    """Отпечаток сырого Accessibility Tree (без парсинга и индексации)"""
+    return hashlib.blake2b(repr(accessibility_tree).encode(), digest_size=16).hexdigest()
+
+
+def _logged(method):
+    """Логирование ошибки публичного метода с пробросом исключения"""
+    @wraps(method)
+    async def wrapper(self, target_id, *args, **kwargs):
+        try:
+            return await method(self, target_id, *args, **kwargs)
+        except Exception as e:
+            self.logger.error(f"Error in {method.__name__} for target {target_id}: {e}")
+            raise
+    return wrapper
+
+
+def _logged_swallow(default_factory: Callable[[], Any]):
+    """Логирование ошибки публичного метода с возвратом значения по умолчанию"""
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, target_id, *args, **kwargs):
+            try:
+                return await method(self, target_id, *args, **kwargs)
+            except Exception as e:
+                self.logger.error(f"Error in {method.__name__} for target {target_id}: {e}")
+                return default_factory()
+        return wrapper
+    return decorator
+
+
+@dataclass(slots=True)
 class PageAnalysisResult:
     """Результат анализа страницы"""
     target_id: str
@@ -36,9 +82,79 @@ class PageAnalysisResult:
     analysis_time: float
     total_elements: int
     interactive_count: int
+    
+    # Распределение элементов по ролям (считается один раз на анализ)
+    role_distribution: Dict[str, int] = field(default_factory=dict)
+    
+    # Индексы всех элементов по ролям (для выборок по роли без прохода по странице)
+    role_index: Dict[ElementRole, List[int]] = field(default_factory=dict)
+    
+    # time.monotonic() момента анализа для проверки возраста кэша
+    monotonic_time: float = field(default=0.0, repr=False)
+    
+    # Отпечаток сырого Accessibility Tree, по которому построен результат
+    tree_fingerprint: str = field(default="", repr=False)
+    
+    # Индексы интерактивных элементов для быстрого поиска
+    _by_index: Dict[int, IndexedElement] = field(default_factory=dict, repr=False)
+    _by_role: Dict[str, List[IndexedElement]] = field(default_factory=dict, repr=False)
+    _lower_texts: Optional[List[Tuple[str, IndexedElement]]] = field(default=None, repr=False)
+    _element_dicts: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+    _content_dicts: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+    
+    def build_lookup_indexes(self):
+        """Построение индексов поиска и статистики по ролям"""
+        by_index = self._by_index
+        by_role = self._by_role
+        for element in self.interactive_elements:
+            by_index[element.index] = element
+            by_role.setdefault(ROLE_VALUES[element.role], []).append(element)
+        role_index = self.role_index
+        for element in self.indexed_elements:
+            role_index.setdefault(element.role, []).append(element.index)
+        self.role_distribution = {ROLE_VALUES[role]: len(indices) for role, indices in role_index.items()}
+    
+    def get_lower_texts(self) -> List[Tuple[str, IndexedElement]]:
+        """Тексты интерактивных элементов в нижнем регистре (строятся при первом поиске)"""
+        if self._lower_texts is None:
+            self._lower_texts = [(element.text.lower(), element) for element in self.interactive_elements]
+        return self._lower_texts
+    
+    def get_element_dicts(self) -> List[Dict[str, Any]]:
+        """Интерактивные элементы в формате browser-use (строятся один раз на анализ, не изменять)"""
+        if self._element_dicts is None:
+            self._element_dicts = [
+                {
+                    "index": element.index,
+                    "role": ROLE_VALUES[element.role],
+                    "text": element.text,
+                    "tag_name": element.tag_name,
+                    "xpath": element.xpath,
+                    "is_interactive": element.is_interactive,
+                    "states": [state.value for state in element.states],
+                    "attributes": element.attributes,
+                    "bounding_box": element.bounding_box
+                }
+                for element in self.interactive_elements
+            ]
+        return self._element_dicts
+    
+    def get_content_dicts(self) -> List[Dict[str, Any]]:
+        """Краткое описание всех элементов для извлечения контента (строится один раз, не изменять)"""
+        if self._content_dicts is None:
+            self._content_dicts = [
+                {
+                    "index": element.index,
+                    "role": ROLE_VALUES[element.role],
+                    "text": element.text,
+                    "is_interactive": element.is_interactive
+                }
+                for element in self.indexed_elements
+            ]
+        return self._content_dicts
 
 
-@dataclass
+@dataclass(slots=True)
 class ElementInteractionInfo:
     """Информация об элементе для взаимодействия"""
     index: int
@@ -56,257 +172,262 @@ class DOMAnalyzer:
     """Основной анализатор DOM"""
     
     def __init__(self, config: Optional[DOMAnalyzerConfig] = None):
-        self.config = config or DOMAnalyzerConfig()
+        self.config = config or default_config()
         self.logger = logging.getLogger("DOMAnalyzer")
         
-        # Компоненты анализатора
-        self.cdp_client = CDPClient(self.config.cdp)
-        self.accessibility_parser = AccessibilityParser(self.config.accessibility)
-        self.element_indexer = ElementIndexer(self.config)
+        # Кэш результатов анализа (LRU, не больше config.cache_size записей)
+        self._analysis_cache: "OrderedDict[str, PageAnalysisResult]" = OrderedDict()
         
-        # Кэш результатов анализа
-        self._analysis_cache: Dict[str, PageAnalysisResult] = {}
-        self._last_analysis_time: Dict[str, float] = {}
+        # Кэш ElementInteractionInfo: target_id -> (результат анализа, элементы)
+        self._interaction_cache: Dict[str, Tuple[PageAnalysisResult, List[ElementInteractionInfo]]] = {}
         
         # Статистика
         self._analysis_stats = {
             'total_analyses': 0,
             'cache_hits': 0,
             'cache_misses': 0,
+            'unchanged_tree_hits': 0,
             'total_analysis_time': 0.0
         }
     
+    # Компоненты анализатора создаются лениво, при первом обращении
+    @cached_property
+    def cdp_client(self) -> CDPClient:
+        """CDP клиент"""
+        return CDPClient(self.config.cdp)
+    
+    @cached_property
+    def accessibility_parser(self) -> AccessibilityParser:
+        """Парсер Accessibility Tree"""
+        return AccessibilityParser(self.config.accessibility)
+    
+    @cached_property
+    def element_indexer(self) -> ElementIndexer:
+        """Индексатор элементов"""
+        return ElementIndexer(self.config)
+    
+    @_logged
     async def analyze_page(self, target_id: str, force_refresh: bool = False) -> PageAnalysisResult:
         """Анализ страницы и получение состояния"""
         start_time = time.time()
+        started = time.monotonic()
         
-        try:
-            self.logger.info(f"Starting page analysis for target {target_id}")
-            
-            # Проверяем кэш
-            if not force_refresh and self._should_use_cached_result(target_id):
-                self._analysis_stats['cache_hits'] += 1
-                cached_result = self._analysis_cache[target_id]
-                self.logger.info(f"Using cached analysis result for target {target_id}")
-                return cached_result
-            
-            self._analysis_stats['cache_misses'] += 1
-            
-            # Подключаемся к CDP если не подключены
-            if not self.cdp_client.is_connected():
-                await self._ensure_cdp_connection()
-            
-            # Получаем информацию о странице
-            page_info = await self._get_page_info(target_id)
-            
-            # Получаем Accessibility Tree
-            accessibility_tree = await self._get_accessibility_tree(target_id)
-            
-            # Парсим Accessibility Tree
-            accessibility_nodes = self.accessibility_parser.parse_accessibility_tree(accessibility_tree)
-            
-            # Индексируем элементы
-            indexed_elements = self.element_indexer.index_elements(accessibility_nodes)
-            
-            # Фильтруем интерактивные элементы
-            interactive_elements = self.element_indexer.get_interactive_elements()
-            
-            # Получаем метрики страницы
-            page_metrics = await self._get_page_metrics(target_id)
-            
-            # Вычисляем хеш DOM
-            dom_hash = self._calculate_dom_hash(accessibility_nodes, indexed_elements)
-            
-            # Создаем результат анализа
-            analysis_time = time.time() - start_time
-            result = PageAnalysisResult(
-                target_id=target_id,
-                timestamp=start_time,
-                url=page_info.get('url', ''),
-                title=page_info.get('title', ''),
-                accessibility_nodes=accessibility_nodes,
-                indexed_elements=indexed_elements,
-                interactive_elements=interactive_elements,
-                page_metrics=page_metrics,
-                dom_hash=dom_hash,
-                analysis_time=analysis_time,
-                total_elements=len(indexed_elements),
-                interactive_count=len(interactive_elements)
-            )
-            
-            # Сохраняем в кэш
-            self._analysis_cache[target_id] = result
-            self._last_analysis_time[target_id] = start_time
-            
-            # Обновляем статистику
-            self._update_analysis_stats(analysis_time)
-            
-            self.logger.info(f"Page analysis completed for target {target_id} in {analysis_time:.3f}s. "
-                           f"Found {len(indexed_elements)} elements, {len(interactive_elements)} interactive")
-            
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"Error during page analysis for target {target_id}: {e}")
-            raise
+        self.logger.info(f"Starting page analysis for target {target_id}")
+        
+        # Проверяем кэш
+        cached_result = None if force_refresh else self._get_cached_result(target_id)
+        if cached_result is not None:
+            self._analysis_stats['cache_hits'] += 1
+            self.logger.info(f"Using cached analysis result for target {target_id}")
+            return cached_result
+        
+        self._analysis_stats['cache_misses'] += 1
+        
+        # Подключаемся к CDP если не подключены
+        if not self.cdp_client.is_connected():
+            await self._ensure_cdp_connection()
+        
+        # Информация о странице, Accessibility Tree и метрики одним пакетом CDP команд
+        info_response, trees_response = await self.cdp_client.batch_page_analysis(target_id)
+        page_info = self._extract_page_info(target_id, info_response)
+        accessibility_tree, page_metrics = self._extract_page_trees(target_id, trees_response)
+        url = page_info.get('url', '')
+        title = page_info.get('title', '')
+        
+        # Дерево, URL и заголовок не изменились с прошлого анализа - парсинг и индексация дадут тот же результат
+        tree_fingerprint = _tree_fingerprint(accessibility_tree)
+        previous = self._analysis_cache.get(target_id)
+        if (previous is not None and previous.tree_fingerprint == tree_fingerprint
+                and previous.url == url and previous.title == title):
+            self._analysis_stats['unchanged_tree_hits'] += 1
+            previous.timestamp = start_time
+            previous.monotonic_time = started
+            previous.page_metrics = page_metrics
+            self._store_analysis(target_id, previous)
+            self.logger.info(f"Accessibility tree unchanged for target {target_id}, reusing analysis result")
+            return previous
+        
+        # Парсим Accessibility Tree
+        accessibility_nodes = self.accessibility_parser.parse_accessibility_tree(accessibility_tree)
+        
+        # Индексируем элементы
+        indexed_elements = self.element_indexer.index_elements(accessibility_nodes)
+        
+        # Фильтруем интерактивные элементы
+        interactive_elements = self.element_indexer.get_interactive_elements()
+        
+        # Вычисляем хеш DOM
+        dom_hash = self._calculate_dom_hash(accessibility_nodes, indexed_elements)
+        
+        # Создаем результат анализа
+        analysis_time = time.monotonic() - started
+        result = PageAnalysisResult(
+            target_id=target_id,
+            timestamp=start_time,
+            url=url,
+            title=title,
+            accessibility_nodes=accessibility_nodes,
+            indexed_elements=indexed_elements,
+            interactive_elements=interactive_elements,
+            page_metrics=page_metrics,
+            dom_hash=dom_hash,
+            analysis_time=analysis_time,
+            total_elements=len(indexed_elements),
+            interactive_count=len(interactive_elements),
+            monotonic_time=started,
+            tree_fingerprint=tree_fingerprint
+        )
+        result.build_lookup_indexes()
+        
+        # Сохраняем в кэш
+        self._store_analysis(target_id, result)
+        
+        # Обновляем статистику
+        self._update_analysis_stats(analysis_time)
+        
+        self.logger.info(f"Page analysis completed for target {target_id} in {analysis_time:.3f}s. "
+                       f"Found {len(indexed_elements)} elements, {len(interactive_elements)} interactive")
+        
+        return result
     
+    @_logged
     async def get_page_state(self, target_id: str) -> PageState:
         """Получение состояния страницы в формате PageState"""
-        try:
-            # Анализируем страницу
-            analysis_result = await self.analyze_page(target_id)
-            
-            # Конвертируем в PageState
-            page_state = PageState(
-                url=analysis_result.url,
-                title=analysis_result.title,
-                elements=analysis_result.indexed_elements,
-                timestamp=analysis_result.timestamp,
-                interactive_count=analysis_result.interactive_count,
-                dom_hash=analysis_result.dom_hash
-            )
-            
-            return page_state
-            
-        except Exception as e:
-            self.logger.error(f"Error getting page state for target {target_id}: {e}")
-            raise
+        # Анализируем страницу
+        analysis_result = await self.analyze_page(target_id)
+        
+        # Конвертируем в PageState
+        page_state = PageState(
+            url=analysis_result.url,
+            title=analysis_result.title,
+            elements=analysis_result.indexed_elements,
+            timestamp=analysis_result.timestamp,
+            interactive_count=analysis_result.interactive_count,
+            dom_hash=analysis_result.dom_hash,
+            role_index=analysis_result.role_index
+        )
+        
+        return page_state
     
+    @_logged
     async def get_interactive_elements(self, target_id: str) -> List[ElementInteractionInfo]:
         """Получение интерактивных элементов для взаимодействия"""
-        try:
-            # Анализируем страницу
-            analysis_result = await self.analyze_page(target_id)
-            
-            # Конвертируем в ElementInteractionInfo
-            interaction_elements = []
-            for element in analysis_result.interactive_elements:
-                interaction_info = ElementInteractionInfo(
-                    index=element.index,
-                    role=element.role.value,
-                    text=element.text,
-                    tag_name=element.tag_name,
-                    xpath=element.xpath,
-                    is_interactive=element.is_interactive,
-                    states=[state.value for state in element.states],
-                    attributes=element.attributes,
-                    bounding_box=element.bounding_box
-                )
-                interaction_elements.append(interaction_info)
-            
-            return interaction_elements
-            
-        except Exception as e:
-            self.logger.error(f"Error getting interactive elements for target {target_id}: {e}")
-            raise
+        # Анализируем страницу
+        analysis_result = await self.analyze_page(target_id)
+        
+        # Пока анализ тот же (dom_hash не учитывает состояния узлов), переиспользуем сконвертированный список
+        cached = self._interaction_cache.get(target_id)
+        if cached is not None and cached[0] is analysis_result:
+            return cached[1]
+        
+        # Конвертируем в ElementInteractionInfo
+        interaction_elements = [
+            self._to_interaction_info(element)
+            for element in analysis_result.interactive_elements
+        ]
+        
+        self._interaction_cache[target_id] = (analysis_result, interaction_elements)
+        return interaction_elements
     
+    @_logged_swallow(lambda: None)
     async def find_element_by_text(self, target_id: str, text: str, 
                                   role: Optional[ElementRole] = None) -> Optional[ElementInteractionInfo]:
         """Поиск элемента по тексту"""
-        try:
-            # Получаем интерактивные элементы
-            interactive_elements = await self.get_interactive_elements(target_id)
-            
-            # Ищем элемент по тексту
-            for element in interactive_elements:
-                if text.lower() in element.text.lower():
-                    if role is None or element.role == role.value:
-                        return element
-            
-            return None
-            
-        except Exception as e:
-            self.logger.error(f"Error finding element by text '{text}' for target {target_id}: {e}")
-            return None
+        analysis_result = await self.analyze_page(target_id)
+        
+        element = self._find_in_result(analysis_result, text, role)
+        return self._to_interaction_info(element) if element else None
     
+    @_logged_swallow(list)
     async def find_element_by_role(self, target_id: str, role: ElementRole) -> List[ElementInteractionInfo]:
         """Поиск элементов по роли"""
-        try:
-            # Получаем интерактивные элементы
-            interactive_elements = await self.get_interactive_elements(target_id)
-            
-            # Фильтруем по роли
-            role_elements = [elem for elem in interactive_elements if elem.role == role.value]
-            
-            return role_elements
-            
-        except Exception as e:
-            self.logger.error(f"Error finding elements by role '{role.value}' for target {target_id}: {e}")
-            return []
+        analysis_result = await self.analyze_page(target_id)
+        
+        # Берем элементы нужной роли из индекса
+        return [
+            self._to_interaction_info(element)
+            for element in analysis_result._by_role.get(role.value, ())
+        ]
     
+    @_logged_swallow(lambda: None)
     async def get_element_by_index(self, target_id: str, index: int) -> Optional[ElementInteractionInfo]:
         """Получение элемента по индексу"""
-        try:
-            # Получаем интерактивные элементы
-            interactive_elements = await self.get_interactive_elements(target_id)
-            
-            # Ищем по индексу
-            for element in interactive_elements:
-                if element.index == index:
-                    return element
-            
-            return None
-            
-        except Exception as e:
-            self.logger.error(f"Error getting element by index {index} for target {target_id}: {e}")
+        analysis_result = await self.analyze_page(target_id)
+        
+        # Ищем по индексу
+        element = analysis_result._by_index.get(index)
+        if element is None:
             return None
+        
+        return self._to_interaction_info(element)
     
+    @_logged_swallow(lambda: None)
     async def wait_for_element(self, target_id: str, text: str, timeout: int = 10000) -> Optional[ElementInteractionInfo]:
         """Ожидание появления элемента на странице"""
-        start_time = time.time()
+        deadline = time.monotonic() + timeout / 1000
         
-        try:
-            while (time.time() - start_time) * 1000 < timeout:
-                # Анализируем страницу
-                analysis_result = await self.analyze_page(target_id, force_refresh=True)
-                
-                # Ищем элемент
-                element = await self.find_element_by_text(target_id, text)
-                if element:
-                    return element
-                
-                # Ждем немного перед следующей попыткой
-                await asyncio.sleep(0.5)
+        while time.monotonic() < deadline:
+            # При неизменном дереве analyze_page вернет прежний результат без парсинга
+            analysis_result = await self.analyze_page(target_id, force_refresh=True)
             
-            self.logger.warning(f"Element with text '{text}' not found within {timeout}ms for target {target_id}")
-            return None
+            # Ищем элемент
+            element = self._find_in_result(analysis_result, text)
+            if element:
+                return self._to_interaction_info(element)
             
-        except Exception as e:
-            self.logger.error(f"Error waiting for element '{text}' for target {target_id}: {e}")
-            return None
+            # Ждем немного перед следующей попыткой
+            await asyncio.sleep(0.5)
+        
+        self.logger.warning(f"Element with text '{text}' not found within {timeout}ms for target {target_id}")
+        return None
     
+    @_logged
     async def get_page_summary(self, target_id: str) -> Dict[str, Any]:
         """Получение краткого описания страницы"""
-        try:
-            # Анализируем страницу
-            analysis_result = await self.analyze_page(target_id)
-            
-            # Создаем краткое описание
-            summary = {
-                'url': analysis_result.url,
-                'title': analysis_result.title,
-                'total_elements': analysis_result.total_elements,
-                'interactive_elements': analysis_result.interactive_count,
-                'dom_hash': analysis_result.dom_hash,
-                'analysis_time': analysis_result.analysis_time,
-                'timestamp': analysis_result.timestamp
-            }
-            
-            # Добавляем статистику по ролям
-            role_stats = {}
-            for element in analysis_result.indexed_elements:
-                role = element.role.value
-                if role not in role_stats:
-                    role_stats[role] = 0
-                role_stats[role] += 1
-            
-            summary['role_distribution'] = role_stats
-            
-            return summary
-            
-        except Exception as e:
-            self.logger.error(f"Error getting page summary for target {target_id}: {e}")
-            raise
+        # Анализируем страницу
+        analysis_result = await self.analyze_page(target_id)
+        
+        # Создаем краткое описание
+        summary = {
+            'url': analysis_result.url,
+            'title': analysis_result.title,
+            'total_elements': analysis_result.total_elements,
+            'interactive_elements': analysis_result.interactive_count,
+            'dom_hash': analysis_result.dom_hash,
+            'analysis_time': analysis_result.analysis_time,
+            'timestamp': analysis_result.timestamp
+        }
+        
+        # Добавляем статистику по ролям
+        summary['role_distribution'] = dict(analysis_result.role_distribution)
+        
+        return summary
+    
+    @staticmethod
+    def _find_in_result(analysis_result: PageAnalysisResult, text: str,
+                        role: Optional[ElementRole] = None) -> Optional[IndexedElement]:
+        """Поиск интерактивного элемента по тексту в результате анализа"""
+        # Тексты заранее приведены к нижнему регистру
+        needle = text.lower()
+        for lower_text, element in analysis_result.get_lower_texts():
+            if needle in lower_text and (role is None or element.role == role):
+                return element
+        return None
+    
+    @staticmethod
+    def _to_interaction_info(element: IndexedElement) -> ElementInteractionInfo:
+        """Конвертация IndexedElement в ElementInteractionInfo"""
+        return ElementInteractionInfo(
+            index=element.index,
+            role=ROLE_VALUES[element.role],
+            text=element.text,
+            tag_name=element.tag_name,
+            xpath=element.xpath,
+            is_interactive=element.is_interactive,
+            states=[state.value for state in element.states],
+            attributes=element.attributes,
+            bounding_box=element.bounding_box
+        )
     
     async def _ensure_cdp_connection(self):
         """Обеспечение подключения к CDP"""
@@ -323,21 +444,13 @@ class DOMAnalyzer:
             self.logger.error(f"Error ensuring CDP connection: {e}")
             raise
     
-    async def _get_page_info(self, target_id: str) -> Dict[str, Any]:
-        """Получение базовой информации о странице"""
+    def _extract_page_info(self, target_id: str, response: CDPResponse) -> Dict[str, Any]:
+        """Базовая информация о странице из ответа Target.getTargetInfo"""
         try:
-            # Получаем информацию о вкладке
-            targets_response = await self.cdp_client.get_targets()
-            if not targets_response.success:
-                raise Exception(f"Failed to get targets: {targets_response.error}")
-            
-            # Ищем нужную вкладку
-            target_info = None
-            for target in targets_response.data.get('targets', []):
-                if target.get('id') == target_id:
-                    target_info = target
-                    break
+            if not response.success:
+                raise Exception(response.error)
             
+            target_info = response.data
             if not target_info:
                 raise Exception(f"Target {target_id} not found")
             
@@ -351,65 +464,77 @@ class DOMAnalyzer:
             self.logger.error(f"Error getting page info for target {target_id}: {e}")
             raise
     
-    async def _get_accessibility_tree(self, target_id: str) -> Dict[str, Any]:
-        """Получение Accessibility Tree"""
+    def _extract_page_trees(self, target_id: str,
+                        response: CDPResponse) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Accessibility Tree и метрики страницы из пакетного ответа"""
         try:
-            response = await self.cdp_client.get_accessibility_tree(target_id)
-            if not response.success:
-                raise Exception(f"Failed to get accessibility tree: {response.error}")
+            data = response.data or {}
+            errors = data.get('errors', {})
+            
+            if not response.success or 'accessibility_tree' in errors:
+                error = errors.get('accessibility_tree', response.error)
+                raise Exception(f"Failed to get accessibility tree: {error}")
             
-            return response.data.get('accessibility_tree', {})
+            if 'page_metrics' in errors:
+                self.logger.warning(f"Error getting page metrics for target {target_id}: "
+                                    f"{errors['page_metrics']}")
+            
+            return data.get('accessibility_tree') or {}, data.get('page_metrics')
             
         except Exception as e:
             self.logger.error(f"Error getting accessibility tree for target {target_id}: {e}")
             raise
     
-    async def _get_page_metrics(self, target_id: str) -> Optional[Dict[str, Any]]:
-        """Получение метрик страницы"""
-        try:
-            response = await self.cdp_client.get_page_metrics(target_id)
-            if response.success:
-                return response.data.get('page_metrics')
-            return None
-            
-        except Exception as e:
-            self.logger.warning(f"Error getting page metrics for target {target_id}: {e}")
-            return None
-    
     def _calculate_dom_hash(self, accessibility_nodes: List[AccessibilityNode], 
                            indexed_elements: List[IndexedElement]) -> str:
         """Вычисление хеша DOM для кэширования"""
-        import hashlib
-        
-        # Создаем строку для хеширования
-        hash_string = ""
+        # Хешируем сырые байты полей без промежуточного форматирования строк
+        hasher = hashlib.blake2b(digest_size=16)
         
-        # Добавляем информацию об Accessibility узлах
-        for node in accessibility_nodes:
-            node_info = f"{node.node_id}:{node.role}:{node.name}:{node.value}"
-            hash_string += node_info + "|"
+        # Добавляем информацию об Accessibility узлах:
+        # числа и длины строк пакуются заголовком, строки идут сырыми байтами
+        parts = []
+        append = parts.append
+        for node_id, role, name, value in map(_NODE_HASH_FIELDS, accessibility_nodes):
+            role_b = role.encode()
+            name_b = name.encode()
+            value_b = value.encode() if value is not None else b""
+            append(_pack_node_header(node_id, len(role_b), len(name_b),
+                                     len(value_b) if value is not None else -1))
+            append(role_b)
+            append(name_b)
+            append(value_b)
         
         # Добавляем информацию об индексированных элементах
-        for element in indexed_elements:
-            element_info = f"{element.index}:{element.role.value}:{element.text}"
-            hash_string += element_info + "|"
+        for index, role, text in map(_ELEMENT_HASH_FIELDS, indexed_elements):
+            role_b = ROLE_VALUES[role].encode()
+            text_b = text.encode()
+            append(_pack_element_header(index, len(role_b), len(text_b)))
+            append(role_b)
+            append(text_b)
         
-        # Создаем MD5 хеш
-        return hashlib.md5(hash_string.encode()).hexdigest()
-    
-    def _should_use_cached_result(self, target_id: str) -> bool:
-        """Определение, нужно ли использовать кэшированный результат"""
-        if target_id not in self._analysis_cache:
-            return False
+        hasher.update(b"".join(parts))
         
-        if target_id not in self._last_analysis_time:
-            return False
+        return hasher.hexdigest()
+    
+    def _get_cached_result(self, target_id: str) -> Optional[PageAnalysisResult]:
+        """Кэшированный результат, если он еще не устарел"""
+        cached_result = self._analysis_cache.get(target_id)
+        if (cached_result is None
+                or time.monotonic() - cached_result.monotonic_time >= self.config.indexing.cache_duration):
+            return None
         
-        # Проверяем время жизни кэша
-        cache_age = time.time() - self._last_analysis_time[target_id]
-        max_cache_age = self.config.indexing.cache_duration
+        self._analysis_cache.move_to_end(target_id)
+        return cached_result
+    
+    def _store_analysis(self, target_id: str, result: PageAnalysisResult):
+        """Сохранение результата в LRU-кэш с вытеснением старых записей"""
+        self._analysis_cache[target_id] = result
+        self._analysis_cache.move_to_end(target_id)
         
-        return cache_age < max_cache_age
+        while len(self._analysis_cache) > self.config.cache_size:
+            evicted_id, _ = self._analysis_cache.popitem(last=False)
+            self._interaction_cache.pop(evicted_id, None)
     
     def _update_analysis_stats(self, analysis_time: float):
         """Обновление статистики анализа"""
@@ -432,20 +557,20 @@ class DOMAnalyzer:
     def clear_cache(self, target_id: Optional[str] = None):
         """Очистка кэша анализа"""
         if target_id:
-            if target_id in self._analysis_cache:
-                del self._analysis_cache[target_id]
-            if target_id in self._last_analysis_time:
-                del self._last_analysis_time[target_id]
+            self._analysis_cache.pop(target_id, None)
+            self._interaction_cache.pop(target_id, None)
             self.logger.info(f"Cleared cache for target {target_id}")
         else:
             self._analysis_cache.clear()
-            self._last_analysis_time.clear()
+            self._interaction_cache.clear()
             self.logger.info("Cleared all analysis cache")
     
     async def close(self):
         """Закрытие анализатора"""
         try:
-            await self.cdp_client.disconnect()
+            # Не создаем клиента только ради закрытия
+            if 'cdp_client' in self.__dict__:
+                await self.cdp_client.disconnect()
             self.logger.info("DOM Analyzer closed")
         except Exception as e:
             self.logger.error(f"Error closing DOM Analyzer: {e}")
@@ -8,15 +8,35 @@ Element Indexer
 import hashlib
 import logging
 import time
-from typing import Dict, List, Any, Optional, Set, Tuple
+from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
-from collections import defaultdict
 
-from .types import AccessibilityNode, IndexedElement, ElementRole, ElementState
-from .config import DOMAnalyzerConfig
+from .types import (
+    AccessibilityNode, IndexedElement, ElementRole, ElementState, STATE_BITS, ROLE_VALUES,
+    mask_to_states
+)
+from .config import DOMAnalyzerConfig, default_config
 
 
-@dataclass
+# Интерактивные роли (строятся один раз при импорте).
+# Роли узлов интернируются парсером (sys.intern), а литералы здесь интернированы
+# интерпретатором, поэтому поиск в наборах и сравнения ролей идут по совпадению указателей
+_INTERACTIVE_ROLES = frozenset({
+    'button', 'link', 'textbox', 'checkbox', 'radio',
+    'combobox', 'listbox', 'menu', 'menuitem', 'tab',
+    'dialog', 'alert', 'toolbar', 'grid', 'gridcell'
+})
+_HIDDEN_BIT = STATE_BITS['hidden']
+
+# Таблицы поиска членов перечислений (вместо вызова Enum на каждый узел)
+_STATE_BY_NAME: Dict[str, ElementState] = {state.name: state for state in ElementState}
+_ROLE_BY_VALUE: Dict[str, ElementRole] = {role.value: role for role in ElementRole}
+
+# Экранирование кавычек в XPath за один проход
+_XPATH_ESCAPE = str.maketrans({'"': '\\"', "'": "\\'"})
+
+
+@dataclass(slots=True)
 class IndexedNode:
     """Индексированный узел с дополнительной информацией"""
     node: AccessibilityNode
@@ -33,7 +53,7 @@ class IndexedNode:
     interactive_type: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class IndexingContext:
     """Контекст индексации для отслеживания состояния"""
     timestamp: float
@@ -48,17 +68,19 @@ class ElementIndexer:
     """Система индексации элементов"""
     
     def __init__(self, config: Optional[DOMAnalyzerConfig] = None):
-        self.config = config or DOMAnalyzerConfig()
+        self.config = config or default_config()
         self.logger = logging.getLogger("ElementIndexer")
         
-        # Счетчики индексов
-        self._element_counter = 0
-        
-        # Карты индексов
-        self._index_to_node: Dict[int, IndexedNode] = {}
+        # Карты индексов (индексы плотные, поэтому элементы хранятся списком: index -> элемент;
+        # None - узел с неизвестной ролью, занявший индекс)
+        self._index_to_element: List[Optional[IndexedElement]] = []
         self._node_id_to_index: Dict[int, int] = {}
         self._xpath_to_index: Dict[str, int] = {}
         
+        # Индексы для запросов: интерактивные индексы и индексы по ролям
+        self._interactive_indices: List[int] = []
+        self._indices_by_role: Dict[str, List[int]] = {}
+        
         # Кэш для стабильности
         self._previous_indices: Dict[int, int] = {}
         self._previous_xpaths: Dict[str, int] = {}
@@ -82,8 +104,11 @@ class ElementIndexer:
         try:
             self.logger.info(f"Starting indexing of {len(accessibility_nodes)} accessibility nodes")
             
-            # Создаем контекст индексации
-            dom_hash = self._calculate_dom_hash(accessibility_nodes, dom_data)
+            # Создаем контекст индексации (хеш DOM считается только по запросу)
+            if self.config.indexing.enable_dom_hash:
+                dom_hash = self._calculate_dom_hash(accessibility_nodes, dom_data)
+            else:
+                dom_hash = ""
             self._indexing_context = IndexingContext(
                 timestamp=start_time,
                 dom_hash=dom_hash,
@@ -93,21 +118,18 @@ class ElementIndexer:
                 removed_elements=0
             )
             
-            # Сбрасываем счетчики
-            self._element_counter = 0
+            # Начинаем новые карты (старые остаются у _previous_* без копирования)
+            self._index_to_element = []
+            self._node_id_to_index = {}
+            self._xpath_to_index = {}
+            self._interactive_indices = []
+            self._indices_by_role = {}
             
-            # Очищаем текущие карты
-            self._index_to_node.clear()
-            self._node_id_to_index.clear()
-            self._xpath_to_index.clear()
+            # Индексируем только узлы, прошедшие фильтр
+            indexed_elements = self._index_nodes(self._select_indexable_nodes(accessibility_nodes), dom_data)
             
-            # Индексируем элементы
-            indexed_elements = []
-            
-            for node in accessibility_nodes:
-                indexed_element = self._index_single_node(node, dom_data)
-                if indexed_element:
-                    indexed_elements.append(indexed_element)
+            # Строим индексы для запросов
+            self._build_query_indices()
             
             # Обновляем статистику
             self._update_indexing_stats(len(indexed_elements))
@@ -125,174 +147,126 @@ class ElementIndexer:
             self.logger.error(f"Error during indexing: {e}")
             return []
     
-    def _index_single_node(self, node: AccessibilityNode, 
-                          dom_data: Optional[Dict[str, Any]] = None) -> Optional[IndexedElement]:
-        """Индексация отдельного узла"""
-        try:
-            # Проверяем, нужно ли индексировать этот узел
-            if not self._should_index_node(node):
-                return None
+    def _index_nodes(self, nodes: List[AccessibilityNode],
+                     dom_data: Optional[Dict[str, Any]] = None) -> List[IndexedElement]:
+        """Индексация отфильтрованных узлов одним проходом"""
+        # Горячие атрибуты и методы связываем в локальные переменные один раз
+        index_to_element = self._index_to_element
+        node_id_to_index = self._node_id_to_index
+        xpath_to_index = self._xpath_to_index
+        generate_xpath = self._generate_xpath
+        extract_bounding_box = self._extract_bounding_box
+        extract_tag_name = self._extract_tag_name
+        extract_attributes = self._extract_attributes
+        debug = self.logger.debug
+        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        interactive_roles = _INTERACTIVE_ROLES
+        role_by_value = _ROLE_BY_VALUE
+        state_by_name = _STATE_BY_NAME
+        
+        cached_hits = 0
+        cache_misses = 0
+        indexed_elements = []
+        
+        for node in nodes:
+            node_id = node.node_id
+            parent_id = node.parent_id
+            role = node.role
             
             # Определяем тип индекса
-            index_type = self._determine_index_type(node)
+            if role in interactive_roles:
+                if debug_enabled:
+                    debug("Node %s (%s) is interactive by role", node_id, role)
+                is_interactive = True
+            else:
+                if debug_enabled:
+                    debug("Node %s (%s) is not interactive", node_id, role)
+                is_interactive = False
             
-            # Получаем или создаем индекс
-            if index_type == "interactive":
-                index = self._get_or_create_interactive_index(node)
+            # Получаем или создаем индекс (повтор node_id в пределах прохода)
+            index = node_id_to_index.get(node_id)
+            cached_element = index_to_element[index] if index is not None else None
+            if index is not None and (not is_interactive or
+                                      (cached_element is not None and cached_element.is_interactive)):
+                cached_hits += 1
             else:
-                index = self._get_or_create_element_index(node)
+                # Новый индекс - следующая позиция списка
+                index = len(index_to_element)
+                cache_misses += 1
             
-            # Создаем IndexedNode
-            indexed_node = IndexedNode(
-                node=node,
-                index=index,
-                parent_index=self._get_parent_index(node),
-                children_indices=self._get_children_indices(node),
-                depth=self._calculate_depth(node),
-                is_new=self._is_node_new(node),
-                bounding_box=self._extract_bounding_box(node, dom_data),
-                xpath=self._generate_xpath(node),
-                tag_name=self._extract_tag_name(node, dom_data),
-                attributes=self._extract_attributes(node, dom_data),
-                is_interactive=index_type == "interactive",
-                interactive_type=index_type if index_type == "interactive" else ""
-            )
+            xpath = generate_xpath(node)
             
-            # Сохраняем в карты
-            self._index_to_node[index] = indexed_node
-            self._node_id_to_index[node.node_id] = index
-            self._xpath_to_index[indexed_node.xpath] = index
-            
-            # Конвертируем в IndexedElement
-            indexed_element = self._convert_to_indexed_element(indexed_node)
+            # Узел с неизвестной ролью, как и раньше, занимает индекс,
+            # но элемента для него нет
+            element_role = role_by_value.get(role) if role else ElementRole.GENERIC
+            if element_role is None:
+                element = None
+            else:
+                element = IndexedElement(
+                    index=index,
+                    role=element_role,
+                    text=node.name or "",
+                    tag_name=extract_tag_name(node, dom_data),
+                    attributes=extract_attributes(node, dom_data),
+                    states=[
+                        state_by_name[state_name]
+                        for state_name in mask_to_states(node.state)
+                        if state_name in state_by_name
+                    ],
+                    xpath=xpath,
+                    bounding_box=extract_bounding_box(node, dom_data),
+                    is_interactive=is_interactive,
+                    parent_index=node_id_to_index.get(parent_id) if parent_id is not None else None,
+                    children_indices=[
+                        child_index for child_index in map(node_id_to_index.get, node.children)
+                        if child_index is not None
+                    ]
+                )
             
-            return indexed_element
+            # Сохраняем в карты
+            if index == len(index_to_element):
+                index_to_element.append(element)
+            else:
+                index_to_element[index] = element
+            node_id_to_index[node_id] = index
+            xpath_to_index[xpath] = index
             
-        except Exception as e:
-            self.logger.error(f"Error indexing node {node.node_id}: {e}")
-            return None
-    
-    def _should_index_node(self, node: AccessibilityNode) -> bool:
-        """Определение, нужно ли индексировать узел"""
-        # Игнорируем скрытые узлы
-        if node.state.get('hidden', False):
-            return False
-        
-        # Игнорируем узлы без имени и с generic ролью
-        if not node.name and node.role == 'generic':
-            return False
+            if element is None:
+                self.logger.error(f"Error indexing node {node_id}: '{role}' is not a valid ElementRole")
+                continue
+            indexed_elements.append(element)
         
-        # Игнорируем узлы с очень длинным текстом
-        if node.name and len(node.name) > self.config.accessibility.max_text_length:
-            return False
+        self._indexing_stats['cached_hits'] += cached_hits
+        self._indexing_stats['cache_misses'] += cache_misses
         
-        return True
+        return indexed_elements
     
-    def _determine_index_type(self, node: AccessibilityNode) -> str:
-        """Определение типа индекса для узла"""
-        # Интерактивные роли
-        interactive_roles = {
-            'button', 'link', 'textbox', 'checkbox', 'radio',
-            'combobox', 'listbox', 'menu', 'menuitem', 'tab',
-            'dialog', 'alert', 'toolbar', 'grid', 'gridcell'
-        }
-        
-        if node.role in interactive_roles:
-            self.logger.debug(f"Node {node.node_id} ({node.role}) is interactive by role")
-            return "interactive"
-        
-        # Проверяем состояния на интерактивность
-        interactive_states = {'clickable', 'pressable', 'selectable', 'focusable'}
-        if any(state in node.state for state in interactive_states):
-            self.logger.debug(f"Node {node.node_id} ({node.role}) is interactive by state")
-            return "interactive"
-        
-        self.logger.debug(f"Node {node.node_id} ({node.role}) is not interactive")
-        return "element"
+    def _build_query_indices(self):
+        """Построение списков индексов для get_interactive_elements / get_elements_by_role"""
+        interactive_indices = []
+        indices_by_role: Dict[str, List[int]] = {}
+        
+        for index, element in enumerate(self._index_to_element):
+            if element is None:
+                continue
+            if element.is_interactive:
+                interactive_indices.append(index)
+            indices_by_role.setdefault(ROLE_VALUES[element.role], []).append(index)
+        
+        self._interactive_indices = interactive_indices
+        self._indices_by_role = indices_by_role
     
-    def _get_or_create_interactive_index(self, node: AccessibilityNode) -> int:
-        """Получение или создание интерактивного индекса"""
-        # Проверяем кэш по node_id
-        if node.node_id in self._node_id_to_index:
-            cached_index = self._node_id_to_index[node.node_id]
-            if cached_index in self._index_to_node:
-                cached_node = self._index_to_node[cached_index]
-                if cached_node.is_interactive:
-                    self._indexing_stats['cached_hits'] += 1
-                    return cached_index
-        
-        # Создаем новый интерактивный индекс
-        new_index = self._element_counter
-        self._element_counter += 1
-        self._indexing_stats['cache_misses'] += 1
-        
-        return new_index
-    
-    def _get_or_create_element_index(self, node: AccessibilityNode) -> int:
-        """Получение или создание обычного индекса элемента"""
-        # Проверяем кэш по node_id
-        if node.node_id in self._node_id_to_index:
-            cached_index = self._node_id_to_index[node.node_id]
-            if cached_index in self._index_to_node:
-                self._indexing_stats['cached_hits'] += 1
-                return cached_index
-        
-        # Создаем новый индекс элемента
-        new_index = self._element_counter
-        self._element_counter += 1
-        self._indexing_stats['cache_misses'] += 1
-        
-        return new_index
-    
-    def _get_parent_index(self, node: AccessibilityNode) -> Optional[int]:
-        """Получение индекса родительского узла"""
-        if node.parent_id is None:
-            return None
-        
-        return self._node_id_to_index.get(node.parent_id)
-    
-    def _get_children_indices(self, node: AccessibilityNode) -> List[int]:
-        """Получение индексов дочерних узлов"""
-        children_indices = []
-        for child_id in node.children:
-            child_index = self._node_id_to_index.get(child_id)
-            if child_index is not None:
-                children_indices.append(child_index)
-        
-        return children_indices
-    
-    def _calculate_depth(self, node: AccessibilityNode) -> int:
-        """Вычисление глубины узла в дереве"""
-        depth = 0
-        current_parent_id = node.parent_id
-        
-        while current_parent_id is not None:
-            depth += 1
-            # Находим родительский узел
-            parent_index = self._node_id_to_index.get(current_parent_id)
-            if parent_index is None:
-                break
-            
-            parent_node = self._index_to_node.get(parent_index)
-            if parent_node is None:
-                break
-            
-            current_parent_id = parent_node.node.parent_id
-        
-        return depth
-    
-    def _is_node_new(self, node: AccessibilityNode) -> bool:
-        """Определение, является ли узел новым"""
-        # Проверяем, был ли узел в предыдущей индексации
-        if node.node_id in self._previous_indices:
-            return False
-        
-        # Проверяем по XPath
-        xpath = self._generate_xpath(node)
-        if xpath in self._previous_xpaths:
-            return False
-        
-        return True
+    def _select_indexable_nodes(self, nodes: List[AccessibilityNode]) -> List[AccessibilityNode]:
+        """Отбор узлов для индексации одним проходом до построения объектов"""
+        # Пропускаем скрытые узлы, generic без имени и узлы с очень длинным текстом
+        hidden_bit = _HIDDEN_BIT
+        max_text_length = self.config.accessibility.max_text_length
+        return [
+            node for node in nodes
+            if not node.state & hidden_bit
+            and (node.name or node.role != 'generic')
+            and len(node.name) <= max_text_length
+        ]
     
     def _extract_bounding_box(self, node: AccessibilityNode, 
                              dom_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
@@ -304,24 +278,16 @@ class ElementIndexer:
     def _generate_xpath(self, node: AccessibilityNode) -> str:
         """Генерация XPath для узла"""
         # Простая генерация XPath на основе роли и имени
-        parts = []
+        role_part = node.role if node.role and node.role != 'generic' else ''
         
-        if node.role and node.role != 'generic':
-            parts.append(node.role)
+        # Очищаем имя и значение для XPath
+        name_part = f'[@name="{node.name.translate(_XPATH_ESCAPE)}"]' if node.name else ''
+        value_part = f'[@value="{node.value.translate(_XPATH_ESCAPE)}"]' if node.value else ''
         
-        if node.name:
-            # Очищаем имя для XPath
-            clean_name = node.name.replace('"', '\\"').replace("'", "\\'")
-            parts.append(f'[@name="{clean_name}"]')
+        if not (role_part or name_part or value_part):
+            role_part = 'generic'
         
-        if node.value:
-            clean_value = str(node.value).replace('"', '\\"').replace("'", "\\'")
-            parts.append(f'[@value="{clean_value}"]')
-        
-        if not parts:
-            parts.append('generic')
-        
-        return f"//{parts[0]}{''.join(parts[1:])}"
+        return f"//{role_part}{name_part}{value_part}"
     
     def _extract_tag_name(self, node: AccessibilityNode, 
                           dom_data: Optional[Dict[str, Any]]) -> str:
@@ -333,14 +299,8 @@ class ElementIndexer:
     def _extract_attributes(self, node: AccessibilityNode, 
                            dom_data: Optional[Dict[str, Any]]) -> Dict[str, str]:
         """Извлечение HTML атрибутов"""
-        attributes = {}
-        
-        # Добавляем состояния как атрибуты
-        for state_name, state_value in node.state.items():
-            if state_value is True:
-                attributes[state_name] = "true"
-            elif state_value is False:
-                attributes[state_name] = "false"
+        # Добавляем состояния как атрибуты (в маске только установленные флаги)
+        attributes = dict.fromkeys(mask_to_states(node.state), "true")
         
         # Добавляем основные свойства
         if node.role:
@@ -354,50 +314,21 @@ class ElementIndexer:
         
         return attributes
     
-    def _convert_to_indexed_element(self, indexed_node: IndexedNode) -> IndexedElement:
-        """Конвертация IndexedNode в IndexedElement"""
-        # Конвертируем состояния в ElementState
-        states = []
-        for state_name, state_value in indexed_node.node.state.items():
-            if state_name in ElementState.__members__:
-                try:
-                    state_enum = ElementState(state_name)
-                    states.append(state_enum)
-                except ValueError:
-                    # Игнорируем неизвестные состояния
-                    pass
-        
-        return IndexedElement(
-            index=indexed_node.index,
-            role=ElementRole(indexed_node.node.role) if indexed_node.node.role else ElementRole.GENERIC,
-            text=indexed_node.node.name or "",
-            tag_name=indexed_node.tag_name,
-            attributes=indexed_node.attributes,
-            states=states,
-            xpath=indexed_node.xpath,
-            bounding_box=indexed_node.bounding_box,
-            is_interactive=indexed_node.is_interactive,
-            parent_index=indexed_node.parent_index,
-            children_indices=indexed_node.children_indices
-        )
-    
     def _calculate_dom_hash(self, nodes: List[AccessibilityNode], 
                            dom_data: Optional[Dict[str, Any]]) -> str:
         """Вычисление хеша DOM для кэширования"""
-        # Создаем строку для хеширования
-        hash_string = ""
+        # Хешируем потоково, без накопления общей строки
+        hasher = hashlib.blake2b(digest_size=16)
         
         # Добавляем информацию об узлах
         for node in nodes:
-            node_info = f"{node.node_id}:{node.role}:{node.name}:{node.value}"
-            hash_string += node_info + "|"
+            hasher.update(f"{node.node_id}:{node.role}:{node.name}:{node.value}|".encode())
         
         # Добавляем DOM данные если есть
         if dom_data:
-            hash_string += str(dom_data)
+            hasher.update(str(dom_data).encode())
         
-        # Создаем MD5 хеш
-        return hashlib.md5(hash_string.encode()).hexdigest()
+        return hasher.hexdigest()
     
     def _update_indexing_stats(self, total_indexed: int):
         """Обновление статистики индексации"""
@@ -405,8 +336,8 @@ class ElementIndexer:
         
         # Подсчитываем интерактивные элементы
         interactive_count = 0
-        for indexed_node in self._index_to_node.values():
-            if indexed_node.is_interactive:
+        for element in self._index_to_element:
+            if element is not None and element.is_interactive:
                 interactive_count += 1
         
         self._indexing_stats['interactive_indexed'] = interactive_count
@@ -417,40 +348,28 @@ class ElementIndexer:
     
     def _save_current_indices(self):
         """Сохранение текущих индексов для следующего сравнения"""
-        self._previous_indices = self._node_id_to_index.copy()
-        self._previous_xpaths = self._xpath_to_index.copy()
+        # Карты текущего прохода больше не меняются: следующий проход создает новые
+        self._previous_indices = self._node_id_to_index
+        self._previous_xpaths = self._xpath_to_index
     
     def get_element_by_index(self, index: int) -> Optional[IndexedElement]:
         """Получение элемента по индексу"""
-        indexed_node = self._index_to_node.get(index)
-        if indexed_node:
-            return self._convert_to_indexed_element(indexed_node)
+        if 0 <= index < len(self._index_to_element):
+            return self._index_to_element[index]
         return None
     
     def get_interactive_elements(self) -> List[IndexedElement]:
         """Получение всех интерактивных элементов"""
-        interactive_elements = []
-        
-        for indexed_node in self._index_to_node.values():
-            if indexed_node.is_interactive:
-                element = self._convert_to_indexed_element(indexed_node)
-                interactive_elements.append(element)
-        
-        return sorted(interactive_elements, key=lambda x: x.index)
+        index_to_element = self._index_to_element
+        return [index_to_element[index] for index in self._interactive_indices]
     
     def get_elements_by_role(self, role: ElementRole) -> List[IndexedElement]:
         """Получение элементов по роли"""
-        elements = []
-        
-        for indexed_node in self._index_to_node.values():
-            if indexed_node.node.role == role.value:
-                element = self._convert_to_indexed_element(indexed_node)
-                elements.append(element)
-        
-        return sorted(elements, key=lambda x: x.index)
+        index_to_element = self._index_to_element
+        return [index_to_element[index] for index in self._indices_by_role.get(role.value, ())]
     
     def get_indexing_stats(self) -> Dict[str, Any]:
-        """Получение статистики индексации"""
+        """Получение статистики индексации (dom_hash заполнен при indexing.enable_dom_hash)"""
         stats = self._indexing_stats.copy()
         
         if self._indexing_context:
@@ -465,8 +384,9 @@ class ElementIndexer:
     
     def clear_cache(self):
         """Очистка кэша индексации"""
-        self._previous_indices.clear()
-        self._previous_xpaths.clear()
+        # Снимки делят объекты с текущими картами, поэтому не очищаем их на месте
+        self._previous_indices = {}
+        self._previous_xpaths = {}
         self._indexing_stats['cached_hits'] = 0
         self._indexing_stats['cache_misses'] = 0
     
@@ -6,23 +6,545 @@ MCP сервер, который предоставляет инструмент
 """
 
 import asyncio
+import dataclasses
+import hashlib
 import json
 import logging
+import os
+import select
+import stat
 import sys
-from typing import Dict, List, Any, Optional
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Any, Awaitable, Callable, NamedTuple, Optional, Set, Tuple, Union
+from operator import itemgetter
 from pathlib import Path
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
 # Импортируем наши инструменты
 from .mcp_tools import mcp_dom_tools
-from .config import DOMAnalyzerConfig
+from .config import DOMAnalyzerConfig, default_config
+
+# Максимальная длина строки запроса (аргументы могут содержать большой текст)
+_STDIN_LINE_LIMIT = 16 * 1024 * 1024
+
+# Размер блока чтения stdin, перенаправленного из обычного файла
+_STDIN_READ_SIZE = 256 * 1024
+
+# Результат initialize не зависит от параметров запроса
+_INITIALIZE_RESULT: Dict[str, Any] = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {
+            "listChanged": False
+        }
+    },
+    "serverInfo": {
+        "name": "DOM Analyzer MCP Server",
+        "version": "1.0.0"
+    }
+}
+
+# Описания инструментов, отдаваемые в tools/list
+_TOOLS: Tuple[Dict[str, Any], ...] = (
+    {
+        "name": "browser_get_state",
+        "description": "Get the current page state including all interactive elements with their indices. Essential for interaction",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "include_screenshot": {
+                    "type": "boolean",
+                    "description": "Whether to include a screenshot of the page",
+                    "default": False
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to get state for. If not provided, uses current target"
+                },
+                "startRef": {
+                    "type": "integer",
+                    "description": "Index of the first element to include. Use with the 'trimmed' range of a previous response to page through large snapshots"
+                },
+                "endRef": {
+                    "type": "integer",
+                    "description": "Index of the last element to include"
+                },
+                "known_screenshot_hashes": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Hashes of screenshots the client already has. A matching screenshot is returned as 'screenshot_ref' instead of the full image"
+                }
+            }
+        }
+    },
+    {
+        "name": "browser_click",
+        "description": "Click on an element by its index from browser_get_state. Supports opening links in new tabs",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "index": {
+                    "type": "integer",
+                    "description": "Index of the element to click"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to click on. If not provided, uses current target"
+                },
+                "open_in_new_tab": {
+                    "type": "boolean",
+                    "description": "Whether to open link in new tab (for link elements)",
+                    "default": False
+                }
+            },
+            "required": ["index"]
+        }
+    },
+    {
+        "name": "browser_type",
+        "description": "Type text into an input field identified by its index. Use after browser_get_state to find inputs",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "index": {
+                    "type": "integer",
+                    "description": "Index of the input element"
+                },
+                "text": {
+                    "type": "string",
+                    "description": "Text to type into the input field"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to type on. If not provided, uses current target"
+                }
+            },
+            "required": ["index", "text"]
+        }
+    },
+    {
+        "name": "browser_navigate",
+        "description": "Navigate to a URL in the current tab or open a new tab. Example: Navigate to https://example.com",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {
+                    "type": "string",
+                    "description": "URL to navigate to"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to navigate on. If not provided, uses current target"
+                },
+                "new_tab": {
+                    "type": "boolean",
+                    "description": "Whether to open in new tab",
+                    "default": False
+                }
+            },
+            "required": ["url"]
+        }
+    },
+    {
+        "name": "browser_extract_content",
+        "description": "Extract structured content from the page using AI. Perfect for scraping specific information",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "extraction_prompt": {
+                    "type": "string",
+                    "description": "AI prompt describing what content to extract"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to extract from. If not provided, uses current target"
+                }
+            },
+            "required": ["extraction_prompt"]
+        }
+    },
+    {
+        "name": "browser_scroll",
+        "description": "Scroll the page up or down by one viewport height",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "direction": {
+                    "type": "string",
+                    "enum": ["up", "down"],
+                    "description": "Direction to scroll",
+                    "default": "down"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to scroll. If not provided, uses current target"
+                }
+            }
+        }
+    },
+    {
+        "name": "browser_go_back",
+        "description": "Navigate back to the previous page in browser history",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to go back on. If not provided, uses current target"
+                }
+            }
+        }
+    },
+    {
+        "name": "browser_list_tabs",
+        "description": "List all open browser tabs with their URLs and titles",
+        "inputSchema": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "browser_get_state_and_click",
+        "description": "Click on an element by its index and return the page state after the click in one call",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "index": {
+                    "type": "integer",
+                    "description": "Index of the element to click"
+                },
+                "target_id": {
+                    "type": "string",
+                    "description": "Target ID to use. If not provided, uses current target"
+                },
+                "open_in_new_tab": {
+                    "type": "boolean",
+                    "description": "Whether to open link in new tab (for link elements)",
+                    "default": False
+                }
+            },
+            "required": ["index"]
+        }
+    }
+)
+
+
+# Обертка ответа tools/call без закрывающей скобки (id добавляется при отправке)
+_TOOLS_CALL_PREFIX = b'{"jsonrpc":"2.0","result":{"content":[{"type":"text","text":'
+_TOOLS_CALL_SUFFIX = b'}]}'
+
+# Сколько хешей отправленных скриншотов помнить в сессии
+_SCREENSHOT_HISTORY_SIZE = 16
+
+# Ответ на запрос до инициализации сервера
+_ERR_NOT_INITIALIZED = b'{"error":"Server not initialized","code":"SERVER_ERROR"}'
+
+# Оценка размера элемента снимка в символах: служебные поля плюс текст,
+# который повторяется в text, xpath и атрибуте name
+_ELEMENT_BASE_CHARS = 200
+
+# Ключ сортировки элементов снимка
+_element_index = itemgetter('index')
+
+# Инструменты, меняющие страницу: после них закэшированное состояние недействительно
+_MUTATING_TOOLS = frozenset({
+    'browser_click', 'browser_type', 'browser_navigate', 'browser_scroll', 'browser_go_back',
+    'browser_get_state_and_click'
+})
+
+
+# Аргументы инструментов: разбираются из словаря один раз и передаются позиционно,
+# порядок полей совпадает с сигнатурами методов MCPDOMTools
+class _GetStateArgs(NamedTuple):
+    include_screenshot: bool
+    target_id: Optional[str]
+
+
+class _ClickArgs(NamedTuple):
+    index: int
+    target_id: Optional[str]
+    open_in_new_tab: bool
+
+
+class _GetStateAndClickArgs(NamedTuple):
+    index: int
+    target_id: Optional[str]
+    open_in_new_tab: bool
+
+
+class _TypeArgs(NamedTuple):
+    index: int
+    text: str
+    target_id: Optional[str]
+
+
+class _NavigateArgs(NamedTuple):
+    url: str
+    target_id: Optional[str]
+    new_tab: bool
+
+
+class _ExtractContentArgs(NamedTuple):
+    extraction_prompt: str
+    target_id: Optional[str]
+
+
+class _ScrollArgs(NamedTuple):
+    direction: str
+    target_id: Optional[str]
+
+
+def _json_loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Разбор JSON (orjson, если установлен; принимает memoryview без копирования)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# Опции orjson: dataclass-объекты и нестроковые ключи сериализуются так же, как в stdlib-ветке
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def _json_default(obj: Any) -> Any:
+    """Сериализация dataclass-объектов для stdlib json"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Сериализация в UTF-8 JSON (orjson, если установлен)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode()
+
+
+def _json_dumps_text(obj: Any, pretty: bool = False) -> str:
+    """Сериализация результата инструмента в текст ответа (компактно, с отступами только для отладки)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2 if pretty else _ORJSON_OPTIONS).decode()
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_json_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+def _with_timestamp(text: str, timestamp: Any) -> str:
+    """Добавление времени анализа первым полем в сериализованный объект ответа"""
+    return '{"timestamp":' + _json_dumps_text(timestamp) + ',' + text[1:]
+
+
+def _attach_id(body: bytes, request_id: Any) -> bytes:
+    """Добавление id запроса в ответ, сериализованный без закрывающей скобки"""
+    if request_id:
+        return b"".join((body, b',"id":', _json_dumps(request_id), b"}"))
+    return body + b"}"
+
+
+def _method_not_found(method: str) -> bytes:
+    """Ошибка неизвестного метода без закрывающей скобки (для подстановки id)"""
+    return b"".join((b'{"error":', _json_dumps(f"Unknown method: {method}"), b',"code":"METHOD_NOT_FOUND"'))
+
+
+def _serialize_static_response(result: Dict[str, Any]) -> bytes:
+    """Сериализация статического ответа без закрывающей скобки (для подстановки id)"""
+    return _json_dumps({"jsonrpc": "2.0", "result": result})[:-1]
+
+
+# Статические ответы сериализуются один раз при импорте, при ответе подставляется только id
+_STATIC_RESPONSES: Dict[str, bytes] = {
+    'tools/list': _serialize_static_response({"tools": _TOOLS}),
+    'initialize': _serialize_static_response(_INITIALIZE_RESULT)
+}
+
+
+class _TargetLock:
+    """Блокировка вкладки и число запросов, которые ее держат или ждут"""
+    __slots__ = ('lock', 'users')
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+# Маркер конца входного потока в очереди запросов
+_EOF = object()
+
+
+class _RequestReaderProtocol(asyncio.Protocol):
+    """Чтение stdin блоками: разбиение на строки JSON-RPC и разбор запросов"""
+    
+    def __init__(self, requests: asyncio.Queue, logger: logging.Logger, max_queued: int):
+        self._requests = requests
+        self._logger = logger
+        self._max_queued = max_queued
+        self._buffer = bytearray()
+        self._closed = False
+        self._transport: Optional[asyncio.ReadTransport] = None
+        self._paused = False
+    
+    def connection_made(self, transport: asyncio.BaseTransport):
+        self._transport = transport
+    
+    def data_received(self, data: bytes):
+        buffer = self._buffer
+        if buffer:
+            buffer += data
+            data = buffer
+        
+        # Разбираем все полные строки блока через memoryview, без копирования строк;
+        # в буфер попадает только незавершенный хвост
+        start = 0
+        with memoryview(data) as view:
+            while True:
+                end = data.find(b"\n", start)
+                if end < 0:
+                    break
+                with view[start:end] as line:
+                    self._put_line(line)
+                start = end + 1
+        
+        if data is buffer:
+            del buffer[:start]
+        elif start < len(data):
+            buffer += data[start:]
+        
+        if len(buffer) > _STDIN_LINE_LIMIT:
+            self._logger.error(f"Request line exceeds {_STDIN_LINE_LIMIT} bytes, dropping it")
+            buffer.clear()
+        
+        # Очередь заполнена - перестаем читать, клиент упрется в заполненный pipe
+        if not self._paused and self._requests.qsize() >= self._max_queued:
+            self._paused = True
+            self._transport.pause_reading()
+    
+    def request_taken(self):
+        """Запрос забран из очереди: возобновляем чтение, если очередь освободилась"""
+        if self._paused and self._requests.qsize() < self._max_queued:
+            self._paused = False
+            self._transport.resume_reading()
+    
+    def eof_received(self):
+        # Последняя строка может прийти без перевода строки
+        if self._buffer:
+            self._put_line(self._buffer)
+            self._buffer = bytearray()
+        self._finish()
+    
+    def connection_lost(self, exc: Optional[Exception]):
+        self._finish()
+    
+    def _put_line(self, line: Union[bytearray, memoryview]):
+        """Разбор одной строки и постановка запроса в очередь"""
+        try:
+            request = _json_loads(line)
+        except ValueError as e:
+            # JSONDecodeError и UnicodeDecodeError (stdlib json на невалидном UTF-8)
+            self._logger.error(f"Invalid JSON request: {e}")
+            return
+        self._requests.put_nowait(request)
+    
+    def _finish(self):
+        if not self._closed:
+            self._closed = True
+            self._requests.put_nowait(_EOF)
+
+
+class _FileReadTransport(asyncio.ReadTransport):
+    """Чтение stdin из обычного файла в отдельном потоке: connect_read_pipe принимает
+    только pipe, сокеты и символьные устройства"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, fd: int, protocol: asyncio.Protocol):
+        super().__init__()
+        self._loop = loop
+        self._fd = fd
+        self._protocol = protocol
+        self._reading = threading.Event()
+        self._reading.set()
+        self._closing = False
+        protocol.connection_made(self)
+        self._reader = loop.run_in_executor(None, self._read)
+    
+    def _read(self):
+        """Чтение блоков в потоке; следующий блок читается после разбора предыдущего"""
+        while True:
+            self._reading.wait()
+            if self._closing:
+                return
+            data = os.read(self._fd, _STDIN_READ_SIZE)
+            if self._closing:
+                return
+            if not data:
+                self._loop.call_soon_threadsafe(self._protocol.eof_received)
+                return
+            asyncio.run_coroutine_threadsafe(self._deliver(data), self._loop).result()
+    
+    async def _deliver(self, data: bytes):
+        if not self._closing:
+            self._protocol.data_received(data)
+    
+    def pause_reading(self):
+        self._reading.clear()
+    
+    def resume_reading(self):
+        self._reading.set()
+    
+    def is_reading(self) -> bool:
+        return self._reading.is_set() and not self._closing
+    
+    def is_closing(self) -> bool:
+        return self._closing
+    
+    def close(self):
+        self._closing = True
+        self._reading.set()
+
+
+async def _connect_stdin(loop: asyncio.AbstractEventLoop,
+                         protocol: asyncio.Protocol) -> asyncio.ReadTransport:
+    """Подключение протокола к stdin: pipe читается в event loop, обычный файл - в потоке"""
+    mode = os.fstat(sys.stdin.fileno()).st_mode
+    if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode):
+        transport, _ = await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+        return transport
+    return _FileReadTransport(loop, sys.stdin.fileno(), protocol)
+
+
+# Id обрабатываемого запроса для логов; задается в задаче запроса,
+# поэтому у каждой задачи свое значение
+_request_id_var: ContextVar[Any] = ContextVar("request_id", default="-")
+
+
+class _RequestIdFilter(logging.Filter):
+    """Добавляет в запись лога поле request_id без форматирования строк в обработчиках"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id_var.get()
+        return True
+
+
+logger = logging.getLogger("MCPDOMServer")
 
 
 class MCPDOMServer:
     """MCP сервер для DOM анализатора"""
     
+    __slots__ = (
+        'config', 'logger', 'tools', 'initialized', '_state_cache', '_seen_screenshots',
+        '_content_cache', '_request_semaphore', '_target_locks', '_method_handlers', '_tool_handlers'
+    )
+    
     def __init__(self, config: Optional[DOMAnalyzerConfig] = None):
-        self.config = config or DOMAnalyzerConfig()
-        self.logger = logging.getLogger("MCPDOMServer")
+        self.config = config or default_config()
+        self.logger = logger
         
         # Инициализируем инструменты
         self.tools = mcp_dom_tools
@@ -30,11 +552,39 @@ class MCPDOMServer:
         # Состояние сервера
         self.initialized = False
         
-        # Настройка логирования
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        # Сериализованные ответы browser_get_state: target_id -> (список элементов ответа,
+        # {(include_screenshot, startRef, endRef): текст ответа без timestamp})
+        self._state_cache: Dict[str, Tuple[List[Dict[str, Any]], Dict[Tuple[bool, Any, Any], str]]] = {}
+        
+        # Сериализованные ответы browser_extract_content: target_id -> (список элементов, запрос, текст ответа)
+        self._content_cache: Dict[str, Tuple[List[Dict[str, Any]], Any, str]] = {}
+        
+        # Хеши скриншотов, уже отправленных клиенту (LRU)
+        self._seen_screenshots: OrderedDict[str, None] = OrderedDict()
+        
+        # Ограничение числа одновременно обрабатываемых запросов
+        self._request_semaphore = asyncio.Semaphore(max(1, self.config.server.max_concurrent_requests))
+        
+        # Блокировки вкладок: действия над одной вкладкой выполняются по очереди
+        self._target_locks: Dict[Optional[str], _TargetLock] = {}
+        
+        # Таблицы обработчиков методов MCP и инструментов
+        self._method_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            'tools/list': self._handle_tools_list,
+            'tools/call': self._handle_tools_call,
+            'initialize': self._handle_initialize
+        }
+        self._tool_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Union[Dict[str, Any], str]]]] = {
+            'browser_get_state': self._call_get_state,
+            'browser_click': self._call_click,
+            'browser_type': self._call_type,
+            'browser_navigate': self._call_navigate,
+            'browser_extract_content': self._call_extract_content,
+            'browser_scroll': self._call_scroll,
+            'browser_go_back': self._call_go_back,
+            'browser_list_tabs': self._call_list_tabs,
+            'browser_get_state_and_click': self._call_get_state_and_click
+        }
     
     async def initialize(self) -> bool:
         """Инициализация сервера"""
@@ -71,15 +621,13 @@ class MCPDOMServer:
             params = request.get('params', {})
             request_id = request.get('id')
             
-            self.logger.info(f"Handling request: {method}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Handling request: %s", method)
             
-            # Обрабатываем различные методы
-            if method == 'tools/list':
-                result = await self._handle_tools_list()
-            elif method == 'tools/call':
-                result = await self._handle_tools_call(params)
-            elif method == 'initialize':
-                result = await self._handle_initialize(params)
+            # Обрабатываем метод через таблицу обработчиков
+            handler = self._method_handlers.get(method)
+            if handler is not None:
+                result = await handler(params)
             else:
                 result = {
                     "error": f"Unknown method: {method}",
@@ -101,242 +649,212 @@ class MCPDOMServer:
     
     async def _handle_initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Обработка инициализации"""
-        return {
-            "jsonrpc": "2.0",
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {
-                        "listChanged": False
-                    }
-                },
-                "serverInfo": {
-                    "name": "DOM Analyzer MCP Server",
-                    "version": "1.0.0"
-                }
-            }
-        }
+        # Новая копия из готового JSON: константы модуля остаются неизменными
+        return _json_loads(_STATIC_RESPONSES['initialize'] + b"}")
     
-    async def _handle_tools_list(self) -> Dict[str, Any]:
+    async def _handle_tools_list(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Обработка запроса списка инструментов"""
-        tools = [
-            {
-                "name": "browser_get_state",
-                "description": "Get the current page state including all interactive elements with their indices. Essential for interaction",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "include_screenshot": {
-                            "type": "boolean",
-                            "description": "Whether to include a screenshot of the page",
-                            "default": False
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to get state for. If not provided, uses current target"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "browser_click",
-                "description": "Click on an element by its index from browser_get_state. Supports opening links in new tabs",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "index": {
-                            "type": "integer",
-                            "description": "Index of the element to click"
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to click on. If not provided, uses current target"
-                        },
-                        "open_in_new_tab": {
-                            "type": "boolean",
-                            "description": "Whether to open link in new tab (for link elements)",
-                            "default": False
-                        }
-                    },
-                    "required": ["index"]
-                }
-            },
-            {
-                "name": "browser_type",
-                "description": "Type text into an input field identified by its index. Use after browser_get_state to find inputs",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "index": {
-                            "type": "integer",
-                            "description": "Index of the input element"
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "Text to type into the input field"
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to type on. If not provided, uses current target"
-                        }
-                    },
-                    "required": ["index", "text"]
-                }
-            },
-            {
-                "name": "browser_navigate",
-                "description": "Navigate to a URL in the current tab or open a new tab. Example: Navigate to https://example.com",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "url": {
-                            "type": "string",
-                            "description": "URL to navigate to"
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to navigate on. If not provided, uses current target"
-                        },
-                        "new_tab": {
-                            "type": "boolean",
-                            "description": "Whether to open in new tab",
-                            "default": False
-                        }
-                    },
-                    "required": ["url"]
-                }
-            },
-            {
-                "name": "browser_extract_content",
-                "description": "Extract structured content from the page using AI. Perfect for scraping specific information",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "extraction_prompt": {
-                            "type": "string",
-                            "description": "AI prompt describing what content to extract"
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to extract from. If not provided, uses current target"
-                        }
-                    },
-                    "required": ["extraction_prompt"]
-                }
-            },
-            {
-                "name": "browser_scroll",
-                "description": "Scroll the page up or down by one viewport height",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "direction": {
-                            "type": "string",
-                            "enum": ["up", "down"],
-                            "description": "Direction to scroll",
-                            "default": "down"
-                        },
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to scroll. If not provided, uses current target"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "browser_go_back",
-                "description": "Navigate back to the previous page in browser history",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "target_id": {
-                            "type": "string",
-                            "description": "Target ID to go back on. If not provided, uses current target"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "browser_list_tabs",
-                "description": "List all open browser tabs with their URLs and titles",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            }
-        ]
-        
+        return _json_loads(_STATIC_RESPONSES['tools/list'] + b"}")
+    
+    async def _handle_tools_call(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Обработка вызова инструмента"""
         return {
             "jsonrpc": "2.0",
             "result": {
-                "tools": tools
+                "content": [
+                    {
+                        "type": "text",
+                        "text": await self._call_tool(params)
+                    }
+                ]
             }
         }
     
-    async def _handle_tools_call(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Обработка вызова инструмента"""
+    async def _call_tool(self, params: Dict[str, Any]) -> str:
+        """Вызов инструмента, результат - сериализованный JSON текст"""
         tool_name = params.get('name', '')
         arguments = params.get('arguments', {})
         
-        self.logger.info(f"Calling tool: {tool_name} with arguments: {arguments}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Calling tool: %s with arguments: %s", tool_name, arguments)
+        
+        # Действие меняет страницу - сбрасываем закэшированное состояние
+        if tool_name in _MUTATING_TOOLS:
+            self._invalidate_state_cache(arguments.get('target_id'))
         
         # Вызываем соответствующий инструмент
-        if tool_name == 'browser_get_state':
-            result = await self.tools.browser_get_state(
-                include_screenshot=arguments.get('include_screenshot', False),
-                target_id=arguments.get('target_id')
-            )
-        elif tool_name == 'browser_click':
-            result = await self.tools.browser_click(
-                index=arguments['index'],
-                target_id=arguments.get('target_id'),
-                open_in_new_tab=arguments.get('open_in_new_tab', False)
-            )
-        elif tool_name == 'browser_type':
-            result = await self.tools.browser_type(
-                index=arguments['index'],
-                text=arguments['text'],
-                target_id=arguments.get('target_id')
-            )
-        elif tool_name == 'browser_navigate':
-            result = await self.tools.browser_navigate(
-                url=arguments['url'],
-                target_id=arguments.get('target_id'),
-                new_tab=arguments.get('new_tab', False)
-            )
-        elif tool_name == 'browser_extract_content':
-            result = await self.tools.browser_extract_content(
-                extraction_prompt=arguments['extraction_prompt'],
-                target_id=arguments.get('target_id')
-            )
-        elif tool_name == 'browser_scroll':
-            result = await self.tools.browser_scroll(
-                direction=arguments.get('direction', 'down'),
-                target_id=arguments.get('target_id')
-            )
-        elif tool_name == 'browser_go_back':
-            result = await self.tools.browser_go_back(
-                target_id=arguments.get('target_id')
-            )
-        elif tool_name == 'browser_list_tabs':
-            result = await self.tools.browser_list_tabs()
+        tool_handler = self._tool_handlers.get(tool_name)
+        if tool_handler is not None:
+            result = await tool_handler(arguments)
         else:
             result = {
                 "success": False,
                 "error": f"Unknown tool: {tool_name}"
             }
         
-        return {
-            "jsonrpc": "2.0",
-            "result": {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps(result, indent=2, ensure_ascii=False)
-                    }
-                ]
-            }
-        }
+        return result if isinstance(result, str) else _json_dumps_text(result, self.config.server.debug_pretty)
+    
+    async def _call_get_state(self, arguments: Dict[str, Any]) -> Union[Dict[str, Any], str]:
+        """Вызов browser_get_state (с кэшем сериализованного ответа)"""
+        args = _GetStateArgs(arguments.get('include_screenshot', False), arguments.get('target_id'))
+        start_ref = arguments.get('startRef')
+        end_ref = arguments.get('endRef')
+        variant = (bool(args.include_screenshot), start_ref, end_ref)
+        
+        # Инструменты возвращают тот же список элементов, пока страница не изменилась -
+        # тогда отдаем уже сериализованный текст, меняется только время анализа
+        result = await self.tools.browser_get_state(*args)
+        target_id = result.get('target_id')
+        source = result.get('elements')
+        cached = self._state_cache.get(target_id)
+        if cached is not None and cached[0] is source and variant in cached[1]:
+            return _with_timestamp(cached[1][variant], result.get('timestamp'))
+        
+        result = self._trim_snapshot(result, start_ref, end_ref)
+        result = self._dedup_screenshot(result, arguments.get('known_screenshot_hashes'))
+        
+        # Ответ с полным скриншотом не кэшируем: повторно клиент получит ссылку
+        if target_id and result.get('success') and not result.get('screenshot'):
+            body = dict(result)
+            timestamp = body.pop('timestamp', None)
+            text = _json_dumps_text(body, self.config.server.debug_pretty)
+            if cached is None or cached[0] is not source:
+                cached = self._state_cache[target_id] = (source, {})
+            cached[1][variant] = text
+            return _with_timestamp(text, timestamp)
+        
+        return result
+    
+    def _trim_snapshot(self, result: Dict[str, Any], start_ref: Optional[int],
+                       end_ref: Optional[int]) -> Dict[str, Any]:
+        """Ограничение размера снимка страницы: окно элементов startRef..endRef и лимит символов"""
+        elements = result.get('elements')
+        if not elements:
+            return result
+        
+        # Элементы идут по возрастанию индекса - окно находим бинарным поиском
+        if start_ref is not None or end_ref is not None:
+            low = bisect_left(elements, start_ref, key=_element_index) if start_ref is not None else 0
+            high = bisect_right(elements, end_ref, key=_element_index) if end_ref is not None else len(elements)
+            elements = elements[low:high]
+        
+        # Размер оцениваем по тексту элементов, без пробной сериализации
+        limit = self.config.server.max_snapshot_chars
+        size = 0
+        count = 0
+        for element in elements:
+            size += _ELEMENT_BASE_CHARS + 3 * len(element.get('text') or '')
+            if size > limit:
+                break
+            count += 1
+        
+        if count == len(elements):
+            if elements is result['elements']:
+                return result
+            return {**result, 'elements': elements}
+        
+        # Первый элемент окна оставляем даже сверх лимита, иначе по снимку не пройти дальше
+        elements = elements[:max(count, 1)]
+        trimmed = dict(result)
+        trimmed['elements'] = elements
+        trimmed['trimmed'] = [elements[0]['index'], elements[-1]['index']]
+        return trimmed
+    
+    def _dedup_screenshot(self, result: Dict[str, Any],
+                          known_hashes: Optional[List[str]]) -> Dict[str, Any]:
+        """Замена уже отправленного клиенту скриншота ссылкой на его хеш"""
+        screenshot = result.get('screenshot')
+        if not screenshot:
+            return result
+        
+        data = screenshot.encode() if isinstance(screenshot, str) else screenshot
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        
+        seen = self._seen_screenshots
+        result = dict(result)
+        if digest in seen or (known_hashes and digest in known_hashes):
+            seen[digest] = None
+            seen.move_to_end(digest)
+            result['screenshot'] = None
+            result['screenshot_ref'] = digest
+            return result
+        
+        seen[digest] = None
+        if len(seen) > _SCREENSHOT_HISTORY_SIZE:
+            seen.popitem(last=False)
+        result['screenshot_hash'] = digest
+        return result
+    
+    def _invalidate_state_cache(self, target_id: Optional[str]):
+        """Сброс закэшированного состояния страницы"""
+        target_id = target_id or self.tools.current_target_id
+        if target_id:
+            self._state_cache.pop(target_id, None)
+            self._content_cache.pop(target_id, None)
+    
+    async def _call_click(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_click"""
+        return await self.tools.browser_click(*_ClickArgs(
+            arguments['index'], arguments.get('target_id'), arguments.get('open_in_new_tab', False)
+        ))
+    
+    async def _call_get_state_and_click(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_get_state_and_click (снимок ограничивается так же, как в browser_get_state)"""
+        result = await self.tools.browser_get_state_and_click(*_GetStateAndClickArgs(
+            arguments['index'], arguments.get('target_id'), arguments.get('open_in_new_tab', False)
+        ))
+        state = result.get('state')
+        if state is None:
+            return result
+        return {**result, 'state': self._trim_snapshot(state, None, None)}
+    
+    async def _call_type(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_type"""
+        return await self.tools.browser_type(*_TypeArgs(
+            arguments['index'], arguments['text'], arguments.get('target_id')
+        ))
+    
+    async def _call_navigate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_navigate"""
+        return await self.tools.browser_navigate(*_NavigateArgs(
+            arguments['url'], arguments.get('target_id'), arguments.get('new_tab', False)
+        ))
+    
+    async def _call_extract_content(self, arguments: Dict[str, Any]) -> Union[Dict[str, Any], str]:
+        """Вызов browser_extract_content (ответ сериализуется один раз на анализ и запрос)"""
+        result = await self.tools.browser_extract_content(*_ExtractContentArgs(
+            arguments['extraction_prompt'], arguments.get('target_id')
+        ))
+        content = result.get('extracted_content')
+        target_id = result.get('target_id')
+        if self.config.server.debug_pretty or not target_id or not isinstance(content, dict):
+            return result
+        
+        # Инструменты отдают тот же список, пока страница не изменилась, а остальные поля
+        # ответа строятся из того же результата анализа - отдаем уже сериализованный ответ
+        elements = content.get('elements')
+        prompt = result.get('extraction_prompt')
+        cached = self._content_cache.get(target_id)
+        if cached is not None and cached[0] is elements and cached[1] == prompt:
+            return cached[2]
+        
+        text = _json_dumps_text(result)
+        self._content_cache[target_id] = (elements, prompt, text)
+        return text
+    
+    async def _call_scroll(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_scroll"""
+        return await self.tools.browser_scroll(*_ScrollArgs(
+            arguments.get('direction', 'down'), arguments.get('target_id')
+        ))
+    
+    async def _call_go_back(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_go_back"""
+        return await self.tools.browser_go_back(arguments.get('target_id'))
+    
+    async def _call_list_tabs(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Вызов browser_list_tabs"""
+        return await self.tools.browser_list_tabs()
     
     async def run(self):
         """Запуск MCP сервера"""
@@ -349,29 +867,49 @@ class MCPDOMServer:
             self.logger.info("MCP DOM Server is running...")
             self.logger.info("Waiting for MCP requests...")
             
+            loop = asyncio.get_running_loop()
+            
+            # Читаем stdin прямо в event loop: протокол режет поток на строки
+            # и кладет разобранные запросы в очередь
+            max_inflight = max(1, self.config.server.max_inflight_requests)
+            requests: asyncio.Queue = asyncio.Queue()
+            protocol = _RequestReaderProtocol(requests, self.logger, max_inflight)
+            transport = await _connect_stdin(loop, protocol)
+            
+            # Ответы пишет одна задача, чтобы строки JSON-RPC не перемешивались
+            responses: asyncio.Queue = asyncio.Queue()
+            writer_task = asyncio.create_task(self._write_responses(responses))
+            pending: Set[asyncio.Task] = set()
+            
+            # Не больше max_inflight принятых запросов одновременно; остальные ждут
+            # в очереди, а при ее заполнении чтение stdin приостанавливается
+            inflight = asyncio.Semaphore(max_inflight)
+            
+            def request_done(task: asyncio.Task):
+                pending.discard(task)
+                inflight.release()
+            
             # Основной цикл обработки запросов
-            while True:
-                try:
-                    # Читаем запрос из stdin
-                    line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-                    
-                    if not line:
+            try:
+                while True:
+                    await inflight.acquire()
+                    request = await requests.get()
+                    protocol.request_taken()
+                    if request is _EOF:
                         break
                     
-                    # Парсим JSON запрос
-                    request = json.loads(line.strip())
-                    
-                    # Обрабатываем запрос
-                    response = await self.handle_request(request)
-                    
-                    # Отправляем ответ в stdout
-                    print(json.dumps(response, ensure_ascii=False))
-                    sys.stdout.flush()
-                    
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"Invalid JSON request: {e}")
-                except Exception as e:
-                    self.logger.error(f"Error processing request: {e}")
+                    # Обрабатываем запрос в отдельной задаче
+                    task = asyncio.create_task(self._process_request(request, responses))
+                    pending.add(task)
+                    task.add_done_callback(request_done)
+            finally:
+                transport.close()
+            
+            # Дожидаемся незавершенных запросов и записи всех ответов
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await responses.put(None)
+            await writer_task
                     
         except KeyboardInterrupt:
             self.logger.info("Server interrupted by user")
@@ -381,6 +919,132 @@ class MCPDOMServer:
             # Очищаем ресурсы
             await self.cleanup()
     
+    async def _process_request(self, request: Dict[str, Any], responses: asyncio.Queue):
+        """Обработка одного запроса и постановка ответа в очередь записи"""
+        if isinstance(request, dict):
+            _request_id_var.set(request.get('id', "-"))
+        
+        method = request.get('method', '') if isinstance(request, dict) else None
+        if isinstance(method, str):
+            if not self.initialized:
+                await responses.put(_ERR_NOT_INITIALIZED)
+                return
+            
+            static_response = _STATIC_RESPONSES.get(method)
+            if static_response is not None:
+                await responses.put(_attach_id(static_response, request.get('id')))
+                return
+            
+            if method == 'tools/call':
+                response = await self._run_tools_call(request)
+                await responses.put(response)
+                return
+            
+            if method not in self._method_handlers:
+                await responses.put(_attach_id(_method_not_found(method), request.get('id')))
+                return
+        
+        async with self._request_semaphore:
+            response = await self.handle_request(request)
+        await responses.put(response)
+    
+    async def _run_tools_call(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        """tools/call в порядке поступления для своей вкладки"""
+        params = request.get('params')
+        params = params if isinstance(params, dict) else {}
+        arguments = params.get('arguments')
+        arguments = arguments if isinstance(arguments, dict) else {}
+        
+        # Блокировку берем до первого await: задачи стартуют в порядке поступления
+        # запросов, а очередь ожидающих asyncio.Lock - FIFO
+        target_id = arguments.get('target_id') or self.tools.current_target_id
+        if not isinstance(target_id, str):
+            target_id = None
+        target_lock = self._target_locks.get(target_id)
+        if target_lock is None:
+            target_lock = self._target_locks[target_id] = _TargetLock()
+        target_lock.users += 1
+        
+        try:
+            if isinstance(params.get('name'), str) and params['name'] in _MUTATING_TOOLS:
+                # Действие над вкладкой - строго по одному
+                async with target_lock.lock:
+                    async with self._request_semaphore:
+                        return await self._encode_tools_call(request)
+            
+            # Чтение дожидается ранее пришедших действий и дальше идет параллельно с другими чтениями
+            async with target_lock.lock:
+                pass
+        finally:
+            # Блокировку, которую никто не держит и не ждет, убираем: id вкладок присылает клиент
+            target_lock.users -= 1
+            if not target_lock.users:
+                del self._target_locks[target_id]
+        
+        async with self._request_semaphore:
+            return await self._encode_tools_call(request)
+    
+    async def _encode_tools_call(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        """Ответ tools/call сразу в байтах: текст результата экранируется один раз"""
+        try:
+            text = await self._call_tool(request.get('params', {}))
+            body = b"".join((_TOOLS_CALL_PREFIX, _json_dumps(text), _TOOLS_CALL_SUFFIX))
+            return _attach_id(body, request.get('id'))
+        except Exception as e:
+            self.logger.error(f"Error handling request: {e}")
+            return {
+                "error": str(e),
+                "code": "INTERNAL_ERROR"
+            }
+    
+    async def _write_responses(self, responses: asyncio.Queue):
+        """Запись ответов в stdout; готовые ответы пишутся одним системным вызовом"""
+        out_fd = sys.stdout.buffer.fileno()
+        
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            
+            try:
+                payload = [self._encode_response(response), b"\n"]
+                finished = False
+                
+                # Забираем уже готовые ответы, чтобы писать их вместе
+                while not responses.empty():
+                    response = responses.get_nowait()
+                    if response is None:
+                        finished = True
+                        break
+                    payload += (self._encode_response(response), b"\n")
+                
+                self._write_all(out_fd, b"".join(payload))
+                
+                if finished:
+                    return
+            except Exception as e:
+                self.logger.error(f"Error writing response: {e}")
+    
+    @staticmethod
+    def _write_all(fd: int, data: bytes):
+        """Запись в файловый дескриптор мимо текстового слоя sys.stdout"""
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(fd, view)
+            except BlockingIOError:
+                # stdout может быть неблокирующим, если делит описание файла с stdin
+                select.select([], [fd], [])
+                continue
+            view = view[written:]
+    
+    @staticmethod
+    def _encode_response(response: Union[Dict[str, Any], bytes]) -> bytes:
+        """Сериализация ответа (предсериализованные ответы пишутся как есть)"""
+        if isinstance(response, bytes):
+            return response
+        return _json_dumps(response)
+
     async def cleanup(self):
         """Очистка ресурсов сервера"""
         try:
@@ -393,6 +1057,15 @@ class MCPDOMServer:
 
 async def main():
     """Основная функция"""
+    # Настройка логирования только при запуске сервера, а не при импорте модуля
+    handler = logging.StreamHandler()
+    handler.addFilter(_RequestIdFilter())
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
+        handlers=[handler]
+    )
+    
     # Создаем и запускаем сервер
     server = MCPDOMServer()
     await server.run()
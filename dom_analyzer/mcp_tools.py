@@ -8,19 +8,57 @@ MCP Tools для DOM Analyzer
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
+from collections import OrderedDict
 from dataclasses import asdict
 
 from .dom_analyzer import DOMAnalyzer, PageAnalysisResult, ElementInteractionInfo
 from .types import ElementRole, ElementState
-from .config import DOMAnalyzerConfig
+from .config import DOMAnalyzerConfig, default_config
+
+# Сколько вкладок держать в кэше ответов browser_get_state
+_STATE_CACHE_SIZE = 8
+
+# Роли элементов, принимающих ввод текста
+_INPUT_ROLES: frozenset = frozenset({
+    ElementRole.TEXTBOX, ElementRole.SEARCHBOX, ElementRole.COMBOBOX, ElementRole.TEXTAREA
+})
+
+# Допустимые направления прокрутки
+_SCROLL_DIRECTIONS: frozenset = frozenset({"up", "down"})
+
+# Заготовки успешных ответов browser_click / browser_type: копия готового словаря
+# дешевле сборки литерала с нуля (и фиксирует порядок ключей)
+_CLICK_RESULT: Dict[str, Any] = {
+    "success": True,
+    "message": "",
+    "target_id": "",
+    "element_index": 0,
+    "element_role": "",
+    "element_text": "",
+    "open_in_new_tab": False
+}
+_TYPE_RESULT: Dict[str, Any] = {
+    "success": True,
+    "message": "",
+    "target_id": "",
+    "element_index": 0,
+    "element_role": "",
+    "element_text": "",
+    "input_text": ""
+}
+
+
+def _error_result(error: Exception) -> Dict[str, Any]:
+    """Ответ инструмента с ошибкой"""
+    return {"success": False, "error": str(error)}
 
 
 class MCPDOMTools:
     """MCP инструменты для DOM анализатора"""
     
     def __init__(self, config: Optional[DOMAnalyzerConfig] = None):
-        self.config = config or DOMAnalyzerConfig()
+        self.config = config or default_config()
         self.logger = logging.getLogger("MCPDOMTools")
         
         # DOM анализатор
@@ -29,15 +67,12 @@ class MCPDOMTools:
         # Текущая активная вкладка
         self.current_target_id: Optional[str] = None
         
-        # Кэш результатов анализа
-        self._analysis_cache: Dict[str, PageAnalysisResult] = {}
+        # Кэш ответов browser_get_state (LRU): target_id -> (результат анализа, ответ)
+        self._analysis_cache: OrderedDict[str, Tuple[PageAnalysisResult, Dict[str, Any]]] = OrderedDict()
         
-        # Статистика использования
-        self._usage_stats = {
-            'total_calls': 0,
-            'successful_calls': 0,
-            'failed_calls': 0
-        }
+        # Статистика использования (общее число вызовов = успешные + неудачные)
+        self._successful_calls = 0
+        self._failed_calls = 0
     
     async def initialize(self) -> Dict[str, Any]:
         """Инициализация MCP инструментов"""
@@ -51,6 +86,12 @@ class MCPDOMTools:
             # Подключаемся к CDP
             await self.dom_analyzer._ensure_cdp_connection()
             
+            # Активная вкладка из списка, полученного при подключении (без нового запроса)
+            if not self.current_target_id:
+                targets = await self._get_available_targets()
+                if targets:
+                    self.current_target_id = targets[0]['id']
+            
             self.logger.info("MCP DOM Tools initialized successfully")
             
             return {
@@ -65,23 +106,19 @@ class MCPDOMTools:
                     "browser_extract_content",
                     "browser_scroll",
                     "browser_go_back",
-                    "browser_list_tabs"
+                    "browser_list_tabs",
+                    "browser_get_state_and_click"
                 ]
             }
             
         except Exception as e:
             self.logger.error(f"Error initializing MCP DOM Tools: {e}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_get_state(self, include_screenshot: bool = False, 
                                target_id: Optional[str] = None) -> Dict[str, Any]:
         """Получение состояния браузера (аналог browser_get_state)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -97,61 +134,64 @@ class MCPDOMTools:
             
             self.logger.info(f"Getting browser state for target: {current_target}")
             
-            # Анализируем страницу
-            analysis_result = await self.dom_analyzer.analyze_page(current_target)
-            
-            # Формируем результат в стиле browser-use
-            result = {
-                "success": True,
-                "target_id": current_target,
-                "url": analysis_result.url,
-                "title": analysis_result.title,
-                "timestamp": analysis_result.timestamp,
-                "dom_hash": analysis_result.dom_hash,
-                "total_elements": analysis_result.total_elements,
-                "interactive_elements": analysis_result.interactive_count,
-                "elements": []
-            }
-            
-            # Добавляем элементы в формате browser-use
-            for element in analysis_result.interactive_elements:
-                element_info = {
-                    "index": element.index,
-                    "role": element.role,
-                    "text": element.text,
-                    "tag_name": element.tag_name,
-                    "xpath": element.xpath,
-                    "is_interactive": element.is_interactive,
-                    "states": element.states,
-                    "attributes": element.attributes,
-                    "bounding_box": element.bounding_box
-                }
-                result["elements"].append(element_info)
+            result = await self._get_state(current_target, include_screenshot)
             
-            # Добавляем скриншот если требуется
-            if include_screenshot:
-                # TODO: Реализовать получение скриншота
-                result["screenshot"] = None
-            
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error getting browser state: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
+    
+    async def _get_state(self, target_id: str, include_screenshot: bool = False) -> Dict[str, Any]:
+        """Состояние страницы для browser_get_state (без учета статистики)"""
+        # При неизменном дереве analyze_page возвращает прежний результат -
+        # тогда отдаем уже построенный для него ответ
+        analysis_result = await self.dom_analyzer.analyze_page(target_id, force_refresh=True)
+        cached = self._analysis_cache.get(target_id)
+        if cached is not None and cached[0] is analysis_result:
+            self._analysis_cache.move_to_end(target_id)
+            # Время анализа обновляется и при неизменном дереве - меняем только его
+            result = {**cached[1], "timestamp": analysis_result.timestamp}
+        else:
+            result = self._build_state(target_id, analysis_result)
+            self._analysis_cache[target_id] = (analysis_result, result)
+            self._analysis_cache.move_to_end(target_id)
+            if len(self._analysis_cache) > _STATE_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+        
+        # Добавляем скриншот если требуется (в копию: ответ может быть закэширован)
+        if include_screenshot:
+            # TODO: Реализовать получение скриншота
+            result = {**result, "screenshot": None}
+        
+        return result
+    
+    def _build_state(self, target_id: str, analysis_result: PageAnalysisResult) -> Dict[str, Any]:
+        """Построение ответа browser_get_state по результату анализа"""
+        # Формируем результат в стиле browser-use
+        result = {
+            "success": True,
+            "target_id": target_id,
+            "url": analysis_result.url,
+            "title": analysis_result.title,
+            "timestamp": analysis_result.timestamp,
+            "dom_hash": analysis_result.dom_hash,
+            "total_elements": analysis_result.total_elements,
+            "interactive_elements": analysis_result.interactive_count,
+            # Словари элементов строятся один раз на результат анализа
+            "elements": analysis_result.get_element_dicts()
+        }
+        
+        return result
     
     async def browser_click(self, index: int, target_id: Optional[str] = None, 
                            open_in_new_tab: bool = False) -> Dict[str, Any]:
         """Клик по элементу по индексу (аналог browser_click)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -160,50 +200,81 @@ class MCPDOMTools:
             else:
                 raise Exception("No active browser target")
             
-            self.logger.info(f"Clicking element {index} on target: {current_target}")
+            result = await self._click(current_target, index, open_in_new_tab)
             
-            # Получаем элемент по индексу
-            element = await self.dom_analyzer.get_element_by_index(current_target, index)
+            self._successful_calls += 1
             
-            if not element:
-                raise Exception(f"Element with index {index} not found")
+            return result
             
-            if not element.is_interactive:
-                raise Exception(f"Element with index {index} is not interactive")
+        except Exception as e:
+            self.logger.error(f"Error clicking element {index}: {e}")
+            self._failed_calls += 1
             
-            # Формируем результат
-            result = {
-                "success": True,
-                "message": f"Clicked element [{index}] {element.role}: '{element.text}'",
-                "target_id": current_target,
-                "element_index": index,
-                "element_role": element.role,
-                "element_text": element.text,
-                "open_in_new_tab": open_in_new_tab
-            }
+            return _error_result(e)
+    
+    async def browser_get_state_and_click(self, index: int, target_id: Optional[str] = None,
+                                          open_in_new_tab: bool = False) -> Dict[str, Any]:
+        """Клик по элементу и состояние страницы после него за один вызов"""
+        try:
+            # Определяем target_id
+            if target_id:
+                current_target = target_id
+            elif self.current_target_id:
+                current_target = self.current_target_id
+            else:
+                raise Exception("No active browser target")
             
-            # TODO: Реализовать фактический клик через CDP
-            # Пока возвращаем информацию о том, что клик был бы выполнен
+            click = await self._click(current_target, index, open_in_new_tab)
+            state = await self._get_state(current_target)
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
-            return result
+            return {
+                "success": True,
+                "click": click,
+                "state": state
+            }
             
         except Exception as e:
-            self.logger.error(f"Error clicking element {index}: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self.logger.error(f"Error clicking element {index} and getting state: {e}")
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
+    
+    async def _click(self, target_id: str, index: int, open_in_new_tab: bool) -> Dict[str, Any]:
+        """Клик для browser_click (без учета статистики)"""
+        self.logger.info(f"Clicking element {index} on target: {target_id}")
+        
+        # Действие меняет страницу - закэшированное состояние недействительно
+        self._analysis_cache.pop(target_id, None)
+        
+        # Получаем элемент по индексу
+        element = await self.dom_analyzer.get_element_by_index(target_id, index)
+        
+        if not element:
+            raise Exception(f"Element with index {index} not found")
+        
+        if not element.is_interactive:
+            raise Exception(f"Element with index {index} is not interactive")
+        
+        # Формируем результат
+        result = _CLICK_RESULT.copy()
+        result["message"] = f"Clicked element [{index}] {element.role}: '{element.text}'"
+        result["target_id"] = target_id
+        result["element_index"] = index
+        result["element_role"] = element.role
+        result["element_text"] = element.text
+        result["open_in_new_tab"] = open_in_new_tab
+        
+        # TODO: Реализовать фактический клик через CDP
+        # Пока возвращаем информацию о том, что клик был бы выполнен
+        
+        return result
     
     async def browser_type(self, index: int, text: str, 
                           target_id: Optional[str] = None) -> Dict[str, Any]:
         """Ввод текста в элемент по индексу (аналог browser_type)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -214,6 +285,9 @@ class MCPDOMTools:
             
             self.logger.info(f"Typing text in element {index} on target: {current_target}")
             
+            # Действие меняет страницу - закэшированное состояние недействительно
+            self._analysis_cache.pop(current_target, None)
+            
             # Получаем элемент по индексу
             element = await self.dom_analyzer.get_element_by_index(current_target, index)
             
@@ -221,43 +295,35 @@ class MCPDOMTools:
                 raise Exception(f"Element with index {index} not found")
             
             # Проверяем, что элемент подходит для ввода текста
-            input_roles = {'textbox', 'searchbox', 'combobox', 'textarea'}
-            if element.role not in input_roles:
+            if element.role not in _INPUT_ROLES:
                 raise Exception(f"Element with index {index} is not suitable for text input (role: {element.role})")
             
             # Формируем результат
-            result = {
-                "success": True,
-                "message": f"Typed text in element [{index}] {element.role}: '{element.text}'",
-                "target_id": current_target,
-                "element_index": index,
-                "element_role": element.role,
-                "element_text": element.text,
-                "input_text": text
-            }
+            result = _TYPE_RESULT.copy()
+            result["message"] = f"Typed text in element [{index}] {element.role}: '{element.text}'"
+            result["target_id"] = current_target
+            result["element_index"] = index
+            result["element_role"] = element.role
+            result["element_text"] = element.text
+            result["input_text"] = text
             
             # TODO: Реализовать фактический ввод текста через CDP
             # Пока возвращаем информацию о том, что ввод был бы выполнен
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error typing text in element {index}: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_navigate(self, url: str, target_id: Optional[str] = None, 
                               new_tab: bool = False) -> Dict[str, Any]:
         """Навигация по URL (аналог browser_navigate)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -273,6 +339,9 @@ class MCPDOMTools:
             
             self.logger.info(f"Navigating to {url} on target: {current_target}")
             
+            # Действие меняет страницу - закэшированное состояние недействительно
+            self._analysis_cache.pop(current_target, None)
+            
             # Формируем результат
             result = {
                 "success": True,
@@ -285,25 +354,20 @@ class MCPDOMTools:
             # TODO: Реализовать фактическую навигацию через CDP
             # Пока возвращаем информацию о том, что навигация была бы выполнена
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error navigating to {url}: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_extract_content(self, extraction_prompt: str, 
                                     target_id: Optional[str] = None) -> Dict[str, Any]:
         """Извлечение контента с помощью AI (аналог browser_extract_content)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -314,8 +378,8 @@ class MCPDOMTools:
             
             self.logger.info(f"Extracting content with prompt: {extraction_prompt}")
             
-            # Получаем состояние страницы
-            page_state = await self.dom_analyzer.get_page_state(current_target)
+            # Анализируем страницу (описания элементов строятся один раз на анализ)
+            analysis_result = await self.dom_analyzer.analyze_page(current_target)
             
             # Формируем результат
             result = {
@@ -323,47 +387,34 @@ class MCPDOMTools:
                 "message": "Content extraction completed",
                 "target_id": current_target,
                 "extraction_prompt": extraction_prompt,
-                "page_url": page_state.url,
-                "page_title": page_state.title,
-                "total_elements": len(page_state.elements),
-                "interactive_elements": page_state.interactive_count,
+                "page_url": analysis_result.url,
+                "page_title": analysis_result.title,
+                "total_elements": len(analysis_result.indexed_elements),
+                "interactive_elements": analysis_result.interactive_count,
                 "extracted_content": {
-                    "url": page_state.url,
-                    "title": page_state.title,
-                    "elements": [
-                        {
-                            "index": elem.index,
-                            "role": elem.role.value,
-                            "text": elem.text,
-                            "is_interactive": elem.is_interactive
-                        }
-                        for elem in page_state.elements
-                    ]
+                    "url": analysis_result.url,
+                    "title": analysis_result.title,
+                    "elements": analysis_result.get_content_dicts()
                 }
             }
             
             # TODO: Реализовать AI-извлечение контента
             # Пока возвращаем базовую информацию о странице
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error extracting content: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_scroll(self, direction: str = "down", 
                            target_id: Optional[str] = None) -> Dict[str, Any]:
         """Прокрутка страницы (аналог browser_scroll)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -372,11 +423,14 @@ class MCPDOMTools:
             else:
                 raise Exception("No active browser target")
             
-            if direction not in ["up", "down"]:
+            if direction not in _SCROLL_DIRECTIONS:
                 raise Exception("Direction must be 'up' or 'down'")
             
             self.logger.info(f"Scrolling {direction} on target: {current_target}")
             
+            # Действие меняет страницу - закэшированное состояние недействительно
+            self._analysis_cache.pop(current_target, None)
+            
             # Формируем результат
             result = {
                 "success": True,
@@ -388,24 +442,19 @@ class MCPDOMTools:
             # TODO: Реализовать фактическую прокрутку через CDP
             # Пока возвращаем информацию о том, что прокрутка была бы выполнена
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error scrolling {direction}: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_go_back(self, target_id: Optional[str] = None) -> Dict[str, Any]:
         """Переход назад в истории (аналог browser_go_back)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             # Определяем target_id
             if target_id:
                 current_target = target_id
@@ -416,6 +465,9 @@ class MCPDOMTools:
             
             self.logger.info(f"Going back on target: {current_target}")
             
+            # Действие меняет страницу - закэшированное состояние недействительно
+            self._analysis_cache.pop(current_target, None)
+            
             # Формируем результат
             result = {
                 "success": True,
@@ -426,24 +478,19 @@ class MCPDOMTools:
             # TODO: Реализовать фактический переход назад через CDP
             # Пока возвращаем информацию о том, что переход был бы выполнен
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error going back: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def browser_list_tabs(self) -> Dict[str, Any]:
         """Список открытых вкладок (аналог browser_list_tabs)"""
         try:
-            self._usage_stats['total_calls'] += 1
-            
             self.logger.info("Listing browser tabs")
             
             # Получаем доступные targets
@@ -466,18 +513,15 @@ class MCPDOMTools:
                 }
                 result["tabs"].append(tab_info)
             
-            self._usage_stats['successful_calls'] += 1
+            self._successful_calls += 1
             
             return result
             
         except Exception as e:
             self.logger.error(f"Error listing tabs: {e}")
-            self._usage_stats['failed_calls'] += 1
+            self._failed_calls += 1
             
-            return {
-                "success": False,
-                "error": str(e)
-            }
+            return _error_result(e)
     
     async def _get_available_targets(self) -> List[Dict[str, Any]]:
         """Получение доступных browser targets"""
@@ -507,15 +551,14 @@ class MCPDOMTools:
     
     def get_usage_stats(self) -> Dict[str, Any]:
         """Получение статистики использования"""
-        total_calls = self._usage_stats['total_calls']
-        success_rate = 0.0
-        
-        if total_calls > 0:
-            success_rate = self._usage_stats['successful_calls'] / total_calls
+        successful_calls = self._successful_calls
+        total_calls = successful_calls + self._failed_calls
         
         return {
-            **self._usage_stats,
-            "success_rate": success_rate
+            "total_calls": total_calls,
+            "successful_calls": successful_calls,
+            "failed_calls": self._failed_calls,
+            "success_rate": successful_calls / total_calls if total_calls else 0.0
         }
     
     async def cleanup(self):
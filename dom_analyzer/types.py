@@ -4,16 +4,42 @@
 Определяет структуры данных для работы с DOM, Accessibility Tree и индексацией элементов.
 """
 
-from typing import Dict, List, Optional, Union, Any
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union, Any
 from pydantic import BaseModel, Field
 from enum import Enum
 
 
+# Битовые флаги состояний узла Accessibility Tree
+STATE_BITS: Dict[str, int] = {
+    name: 1 << bit for bit, name in enumerate((
+        'visible', 'hidden', 'disabled', 'readonly', 'required', 'invalid',
+        'expanded', 'collapsed', 'selected', 'checked', 'focused', 'pressed',
+        'busy', 'live'
+    ))
+}
+
+
+def states_to_mask(states: Iterable[str]) -> int:
+    """Упаковка имен состояний в битовую маску (неизвестные имена пропускаются)"""
+    mask = 0
+    for state in states:
+        mask |= STATE_BITS.get(state, 0)
+    return mask
+
+
+def mask_to_states(mask: int) -> List[str]:
+    """Список имен состояний, выставленных в битовой маске"""
+    return [name for name, bit in STATE_BITS.items() if mask & bit]
+
+
 class ElementRole(str, Enum):
     """Роли элементов из Accessibility Tree"""
     BUTTON = "button"
     LINK = "link"
     TEXTBOX = "textbox"
+    SEARCHBOX = "searchbox"
+    TEXTAREA = "textarea"
     CHECKBOX = "checkbox"
     RADIO = "radio"
     COMBOBOX = "combobox"
@@ -36,6 +62,10 @@ class ElementRole(str, Enum):
     GENERIC = "generic"
 
 
+# Строковые значения ролей (обращение к Enum.value идет через дескриптор)
+ROLE_VALUES: Dict[ElementRole, str] = {role: role.value for role in ElementRole}
+
+
 class ElementState(str, Enum):
     """Состояния элементов"""
     VISIBLE = "visible"
@@ -51,19 +81,20 @@ class ElementState(str, Enum):
     FOCUSED = "focused"
 
 
-class IndexedElement(BaseModel):
-    """Индексированный элемент страницы"""
-    index: int = Field(..., description="Уникальный индекс элемента")
-    role: ElementRole = Field(..., description="Роль элемента")
-    text: str = Field(..., description="Видимый текст элемента")
-    tag_name: str = Field(..., description="HTML тег")
-    attributes: Dict[str, str] = Field(default_factory=dict, description="HTML атрибуты")
-    states: List[ElementState] = Field(default_factory=list, description="Состояния элемента")
-    xpath: str = Field(..., description="XPath элемента")
-    bounding_box: Optional[Dict[str, int]] = Field(None, description="Координаты элемента")
-    is_interactive: bool = Field(..., description="Можно ли взаимодействовать с элементом")
-    parent_index: Optional[int] = Field(None, description="Индекс родительского элемента")
-    children_indices: List[int] = Field(default_factory=list, description="Индексы дочерних элементов")
+@dataclass(slots=True, frozen=True)
+class IndexedElement:
+    """Индексированный элемент страницы (создается тысячами за анализ, поэтому без валидации pydantic)"""
+    index: int  # Уникальный индекс элемента
+    role: ElementRole  # Роль элемента
+    text: str  # Видимый текст элемента
+    tag_name: str  # HTML тег
+    xpath: str  # XPath элемента
+    is_interactive: bool  # Можно ли взаимодействовать с элементом
+    attributes: Dict[str, str] = field(default_factory=dict)  # HTML атрибуты
+    states: List[ElementState] = field(default_factory=list)  # Состояния элемента
+    bounding_box: Optional[Dict[str, int]] = None  # Координаты элемента
+    parent_index: Optional[int] = None  # Индекс родительского элемента
+    children_indices: List[int] = field(default_factory=list)  # Индексы дочерних элементов
 
 
 class PageState(BaseModel):
@@ -74,6 +105,7 @@ class PageState(BaseModel):
     elements: List[IndexedElement] = Field(..., description="Индексированные элементы")
     interactive_count: int = Field(..., description="Количество интерактивных элементов")
     dom_hash: str = Field(..., description="Хеш DOM структуры для кэширования")
+    role_index: Dict[ElementRole, List[int]] = Field(default_factory=dict, description="Индексы элементов по ролям")
 
 
 class CDPResponse(BaseModel):
@@ -83,14 +115,24 @@ class CDPResponse(BaseModel):
     error: Optional[str] = Field(None, description="Описание ошибки")
 
 
-class AccessibilityNode(BaseModel):
-    """Узел Accessibility Tree"""
-    node_id: int = Field(..., description="ID узла")
-    role: str = Field(..., description="Роль узла")
-    name: str = Field(..., description="Имя узла")
-    value: Optional[str] = Field(None, description="Значение узла")
-    description: Optional[str] = Field(None, description="Описание узла")
-    state: Dict[str, Any] = Field(default_factory=dict, description="Состояния узла")
-    children: List[int] = Field(default_factory=list, description="ID дочерних узлов")
-    parent_id: Optional[int] = Field(None, description="ID родительского узла")
-    backend_dom_node_id: Optional[int] = Field(None, description="ID DOM узла")
+@dataclass(slots=True, frozen=True)
+class AccessibilityNode:
+    """Узел Accessibility Tree (создается на каждый узел дерева, поэтому без валидации pydantic)"""
+    node_id: int  # ID узла
+    role: str  # Роль узла
+    name: str  # Имя узла
+    value: Optional[str] = None  # Значение узла
+    description: Optional[str] = None  # Описание узла
+    state: int = 0  # Состояния узла (битовая маска STATE_BITS)
+    children: List[int] = field(default_factory=list)  # ID дочерних узлов
+    parent_id: Optional[int] = None  # ID родительского узла
+    backend_dom_node_id: Optional[int] = None  # ID DOM узла
+    is_interactive: bool = False  # Интерактивен ли узел
+    
+    def __post_init__(self):
+        """Совместимость со словарем/списком имен состояний"""
+        state = self.state
+        if isinstance(state, dict):
+            object.__setattr__(self, 'state', states_to_mask(name for name, flag in state.items() if flag is True))
+        elif isinstance(state, (list, tuple, set, frozenset)):
+            object.__setattr__(self, 'state', states_to_mask(state))
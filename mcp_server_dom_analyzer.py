@@ -482,6 +482,36 @@ async def browser_go_back(target_id: Optional[str] = None) -> Dict[str, Any]:
         }
 
 
+@mcp.tool()
+async def browser_get_state_and_click(index: int, target_id: Optional[str] = None,
+                                      open_in_new_tab: bool = False) -> Dict[str, Any]:
+    """
+    Click on an element by its index and return the page state after the click.
+    Saves a round trip for the common "click, then get state" agent step.
+    
+    Args:
+        index: Index of the element to click
+        target_id: Target ID to use. If not provided, uses current target
+        open_in_new_tab: Whether to open link in new tab (for link elements)
+    
+    Returns:
+        Dict containing the click result and the page state after it
+    """
+    try:
+        dom_tools = await _ensure_dom_tools()
+        result = await dom_tools.browser_get_state_and_click(
+            index=index,
+            target_id=target_id,
+            open_in_new_tab=open_in_new_tab
+        )
+        return result
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 @mcp.tool()
 async def browser_list_tabs() -> Dict[str, Any]:
     """
@@ -525,7 +555,8 @@ async def dom_analyzer_status() -> Dict[str, Any]:
                 "browser_extract_content",
                 "browser_scroll",
                 "browser_go_back",
-                "browser_list_tabs"
+                "browser_list_tabs",
+                "browser_get_state_and_click"
             ]
         }
     except Exception as e:
@@ -703,6 +734,7 @@ async def main():
     print("     - browser_scroll: прокрутка страницы")
     print("     - browser_go_back: переход назад")
     print("     - browser_list_tabs: список вкладок")
+    print("     - browser_get_state_and_click: клик и состояние страницы после него за один вызов")
     print("     - dom_analyzer_status: статус DOM анализатора")
     print("   🔄 Legacy инструменты (для совместимости):")
     print("     - browser_navigate: навигация (Playwright)")